@@ -0,0 +1,80 @@
+"""
+Measures the throughput of population generation with the sequential
+method (an analyzer window of 1) and with the pipelined method for the
+configured `--analyzer-window`, by generating the same number of robots
+with each and comparing the wall clock times. Only an analyzer is
+required, the robots are not inserted.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+import trollius
+from trollius import From, Return, ConnectionRefusedError
+
+# Add root directory to import search path
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+'/../')
+
+from tol.config import parser
+from tol.manage import World
+
+parser.add_argument(
+    '--num-robots',
+    default=40, type=int,
+    help="The number of robots to generate with each method."
+)
+
+parser.add_argument(
+    '--num-repeats',
+    default=3, type=int,
+    help="The number of times each method is timed."
+)
+
+
+@trollius.coroutine
+def time_generation(world, n, window, seed):
+    """
+    :param world:
+    :param n:
+    :param window:
+    :param seed: Random seed, so that both methods start from the same candidates
+    :return: Wall clock time in seconds
+    """
+    random.seed(seed)
+    before = time.time()
+    yield From(world.generate_population(n, window=window))
+    raise Return(time.time() - before)
+
+
+@trollius.coroutine
+def run_server():
+    conf = parser.parse_args()
+    conf.output_directory = None
+    conf.restore_directory = None
+
+    # Cached results would make every repeat after the first faster
+    conf.analyzer_cache_size = 0
+
+    world = yield From(World.create(conf))
+    window = max(2, conf.analyzer_window)
+
+    print("iter\tsequential\twindow %d\tspeedup" % window)
+    for i in range(conf.num_repeats):
+        seed = random.randint(0, 1000000)
+        sequential = yield From(time_generation(world, conf.num_robots, 1, seed))
+        pipelined = yield From(time_generation(world, conf.num_robots, window, seed))
+        print("%d\t%f\t%f\t%f" % (i, sequential, pipelined, sequential / pipelined))
+
+
+def main():
+    try:
+        loop = trollius.get_event_loop()
+        loop.run_until_complete(run_server())
+    except KeyboardInterrupt:
+        print("Got Ctrl+C, shutting down.")
+    except ConnectionRefusedError:
+        print("Connection refused, are the world and analyzer loaded?")
+
+if __name__ == '__main__':
+    main()
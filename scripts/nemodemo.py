@@ -2,7 +2,6 @@ from __future__ import absolute_import
 import random
 import itertools
 from revolve.build.util import in_cm, in_mm
-from revolve.util import Time
 import os
 import sys
 import logging
@@ -106,26 +105,27 @@ def pick_position(conf):
 
 
 @trollius.coroutine
-def sleep_sim_time(world, seconds, state_break=[False]):
+def sleep_sim_time(world, seconds, breaks=None):
     """
-    Sleeps for a certain number of simulation seconds,
-    note that this is always approximate as it relies
-    on real world sleeping.
+    Sleeps for a certain number of simulation seconds.
     :param world:
     :param seconds:
-    :param state_break: List containing one boolean, the
-                        wait will be terminated if this
-                        is set to True (basically a hack
-                        to break out of automatic mode early).
+    :param breaks: List the sleep future is added to while
+                   waiting, the wait is terminated early if the
+                   future is resolved through this list (basically
+                   a hack to break out of automatic mode early).
     :return:
     """
-    start = world.last_time if world.last_time else Time()
-    remain = seconds
+    future = world.sleep_sim(seconds)
+    if breaks is None:
+        yield From(future)
+        return
 
-    while remain > 0 and not state_break[0]:
-        yield From(trollius.sleep(0.1))
-        now = world.last_time if world.last_time else Time()
-        remain = seconds - float(now - start)
+    breaks.append(future)
+    try:
+        yield From(future)
+    finally:
+        breaks.remove(future)
 
 
 def get_insert_position(conf, ra, rb, world):
@@ -148,19 +148,13 @@ def get_insert_position(conf, ra, rb, world):
         # Add some randomness to the insert position
         new_pos += 0.1 * pick_position(conf)
 
-        good = True
-        for r in world.robots.values():
-            if not r.last_position:
-                continue
-
-            # Only choose positions that are more than 25cm
-            # away from the nearest bot but closer than 4m
-            # from the furthest bot.
-            diff = r.last_position - new_pos
-            dist = diff.norm()
-            if dist < in_cm(25) or dist > 4:
-                good = False
-                break
+        # Only choose positions that are more than 25cm
+        # away from the nearest bot but closer than 4m
+        # from the furthest bot.
+        index = world.spatial_index
+        _, nearest = index.nearest(new_pos.x, new_pos.y)
+        good = nearest >= in_cm(25) and \
+            len(index.query_radius(new_pos.x, new_pos.y, 4)) == len(index)
 
     return new_pos
 
@@ -222,15 +216,17 @@ def interactive_mode(world, reproduce):
 
 
 @trollius.coroutine
-def automatic_mode(args, world, state):
+def automatic_mode(args, world, state, breaks):
     """
 
     :param args:
     :param world:
+    :param state: List containing one boolean, true if interactive mode is on
+    :param breaks: List of sleep futures to resolve when interactive mode is enabled
     :return:
     """
     logger.debug("Simulating (make sure the world is running)...")
-    yield From(sleep_sim_time(world, 5 if args.fast else 15, state))
+    yield From(sleep_sim_time(world, 5 if args.fast else 15, breaks))
 
     if not state[0]:
         logger.debug("Selecting robots to reproduce...")
@@ -296,6 +292,9 @@ def run_server(conf):
     # List of reproduction requests
     reproduce = []
 
+    # Sleeps of automatic mode, ended when interactive mode is enabled
+    breaks = []
+
     # Request callback for the subscriber
     def callback(data):
         req = Request()
@@ -314,7 +313,11 @@ def run_server(conf):
             interactive[0] = imode_value
             print("Interactive mode is now %s" % ("ON" if interactive[0] else "OFF"))
 
-            if not interactive[0]:
+            if interactive[0]:
+                for future in breaks:
+                    if not future.done():
+                        future.set_result(None)
+            else:
                 reproduce[:] = []
 
     subscriber = world.manager.subscribe(
@@ -325,7 +328,7 @@ def run_server(conf):
         if interactive[0]:
             yield From(interactive_mode(world, reproduce))
         else:
-            yield From(automatic_mode(conf, world, interactive))
+            yield From(automatic_mode(conf, world, interactive, breaks))
 
         yield From(trollius.sleep(0.1))
         yield From(cleanup(world))
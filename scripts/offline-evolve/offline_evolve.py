@@ -10,9 +10,10 @@
 # -- Comma scheme, get rid of the parents and continue with children only
 from __future__ import absolute_import
 import sys
+import copy
+import math
 import time
 import os
-import shutil
 import random
 import csv
 import itertools
@@ -26,7 +27,8 @@ from sdfbuilder.math import Vector3
 from revolve.util import wait_for
 
 from tol.manage.robot import Robot
-from tol.config import parser
+from tol.manage.cache import FitnessCache, genome_key
+from tol.config import parser, instance_address
 from tol.manage import World
 from tol.logging import logger, output_console
 
@@ -86,6 +88,78 @@ parser.add_argument(
          "that the world may have become slow and restarting will help."
 )
 
+parser.add_argument(
+    '--evaluation-slots',
+    default=1, type=int,
+    help="Number of robots that are evaluated concurrently in a single "
+         "simulation window, each in its own slot of a grid."
+)
+
+parser.add_argument(
+    '--slot-spacing',
+    default=10.0, type=float,
+    help="Distance in meters between evaluation slots, this should be well "
+         "beyond the distance a robot can travel in one evaluation."
+)
+
+parser.add_argument(
+    '--evaluation-workers',
+    default=1, type=int,
+    help="Number of simulator / analyzer pairs evaluations are distributed over. "
+         "Worker `i` uses the ports of `--world-address` and `--analyzer-address` plus 2 * i."
+)
+
+parser.add_argument(
+    '--racing',
+    default=False, type=lambda v: v.lower() == "true" or v == "1",
+    help="With `--keep-parents`, cut evaluations short as soon as a child can "
+         "no longer beat the worst survivor of the previous generation."
+)
+
+parser.add_argument(
+    '--racing-max-speed',
+    default=0.5, type=float,
+    help="Maximum robot speed in m/s assumed when bounding the final fitness "
+         "of a partial evaluation."
+)
+
+parser.add_argument(
+    '--racing-interval',
+    default=1.0, type=float,
+    help="Simulation seconds between racing checks."
+)
+
+parser.add_argument(
+    '--fitness-cache-evaluations',
+    default=0, type=int,
+    help="If nonzero, robots with a genome identical to that of an earlier robot are "
+         "only evaluated until the genome has this many evaluations. After that the "
+         "earlier evaluation is reused, and selection uses the average fitness."
+)
+
+parser.add_argument(
+    '--steady-state',
+    default=False, type=lambda v: v.lower() == "true" or v == "1",
+    help="Asynchronous steady state evolution: whenever an evaluation worker is available, "
+         "children are bred for each of its `--evaluation-slots` and evaluated, and "
+         "each is inserted in the population as soon as its evaluation finishes. Every "
+         "`--num-children` evaluations form a virtual generation."
+)
+
+
+def slot_positions(n, spacing):
+    """
+    Returns `n` positions on a square grid centered around
+    the origin; a single slot is placed at the origin.
+    :param n:
+    :param spacing:
+    :return:
+    """
+    cols = int(math.ceil(math.sqrt(n)))
+    rows = int(math.ceil(float(n) / cols))
+    return [((i % cols - 0.5 * (cols - 1)) * spacing,
+             (i // cols - 0.5 * (rows - 1)) * spacing) for i in range(n)]
+
 
 class OfflineEvoManager(World):
     """
@@ -100,23 +174,65 @@ class OfflineEvoManager(World):
         """
         super(OfflineEvoManager, self).__init__(conf, _private)
 
-        self.generations_filename = None
-        self.generations_file = None
+        # Output files by name, see `open_output`
+        self.outputs = {}
         self.write_generations = None
+        self.write_evaluations = None
+        self.write_racing = None
 
         self._snapshot_data = {}
 
+        # Robots of which the evaluation was cut short in the current
+        # evolution run, by name, with the simulation time saved.
+        self.cut_short = {}
+
+        self.fitness_cache = FitnessCache(conf.fitness_cache_evaluations) \
+            if conf.fitness_cache_evaluations > 0 else None
+
+        # Managers of the simulators evaluations are distributed over,
+        # see `create_workers`.
+        self.workers = [self]
+        self.idle_workers = None
+
         if self.output_directory:
-            self.generations_filename = os.path.join(self.output_directory, 'generations.csv')
+            self.write_generations = self.open_output(
+                'generations', ['run', 'gen', 'robot_id', 'vel', 'dvel', 'fitness', 't_eval'])
 
-            if self.do_restore:
-                shutil.copy(self.generations_filename+'.snapshot', self.generations_filename)
-                self.generations_file = open(self.generations_filename, 'ab', buffering=1)
-                self.write_generations = csv.writer(self.generations_file, delimiter=',')
-            else:
-                self.generations_file = open(self.generations_filename, 'wb', buffering=1)
-                self.write_generations = csv.writer(self.generations_file, delimiter=',')
-                self.write_generations.writerow(['run', 'gen', 'robot_id', 'vel', 'dvel', 'fitness', 't_eval'])
+            # Every evaluated child, in order of completion
+            self.write_evaluations = self.open_output(
+                'evaluations', ['run', 'eval', 'gen', 'robot_id', 'parent1', 'parent2',
+                                'vel', 'dvel', 'fitness', 't_eval', 'cut_short', 't_saved'])
+
+            # Evaluations cut short by racing per generation
+            self.write_racing = self.open_output(
+                'racing', ['run', 'gen', 'children', 'cut_short', 't_saved'])
+
+    def open_output(self, name, header):
+        """
+        Opens the CSV output file `<name>.csv`. When restoring, the file
+        is truncated to its size at the time of the snapshot, otherwise
+        a new file is started with the given header.
+        :param name:
+        :param header:
+        :return: CSV writer
+        """
+        filename = os.path.join(self.output_directory, '%s.csv' % name)
+        if self.do_restore:
+            f = open(filename, 'ab', buffering=1)
+
+            # Discard the rows written after the snapshot
+            offset = self.do_restore.get('%s_offset' % name)
+            if offset is not None:
+                f.truncate(offset)
+
+            writer = csv.writer(f, delimiter=',')
+        else:
+            f = open(filename, 'wb', buffering=1)
+            writer = csv.writer(f, delimiter=',')
+            writer.writerow(header)
+
+        self.outputs[name] = f
+        return writer
 
     def robots_header(self):
         return Robot.header()
@@ -131,28 +247,65 @@ class OfflineEvoManager(World):
         """
         self = cls(_private=cls._PRIVATE, conf=conf)
         yield From(self._init())
+        yield From(self.create_workers())
         raise Return(self)
 
     @trollius.coroutine
-    def create_snapshot(self):
+    def create_workers(self):
         """
-        Copy the generations file in the snapshot
+        Connects to the simulator / analyzer pairs of the additional
+        evaluation workers. The worker managers have no output of
+        their own, the robot IDs they use are handed out by this manager.
         :return:
         """
-        ret = yield From(super(OfflineEvoManager, self).create_snapshot())
-        if not ret:
-            raise Return(ret)
+        for i in range(1, self.conf.evaluation_workers):
+            conf = copy.copy(self.conf)
+            conf.world_address = instance_address(self.conf.world_address, i)
+            conf.analyzer_address = instance_address(self.conf.analyzer_address, i)
+            conf.output_directory = None
+            conf.restore_directory = None
+            conf.analyzer_cache_file = None
+            conf.evaluation_workers = 1
+
+            # The worker's simulator may still be starting
+            for attempt in range(30):
+                try:
+                    worker = yield From(OfflineEvoManager.create(conf))
+                    break
+                except (IOError, OSError):
+                    logger.debug("Worker %d is not available yet, retrying..." % i)
+                    yield From(trollius.sleep(1.0))
+            else:
+                raise RuntimeError("Could not connect to evaluation worker at `%s`." %
+                                   conf.world_address)
+
+            # Start from an empty, paused world in case the
+            # simulator is still running from an earlier run.
+            yield From(wait_for(worker.pause(True)))
+            yield From(wait_for(worker.delete_all_robots()))
+            yield From(wait_for(worker.reset()))
 
-        self.generations_file.flush()
-        shutil.copy(self.generations_filename, self.generations_filename+'.snapshot')
+            worker.get_robot_id = self.get_robot_id
+            self.workers.append(worker)
+
+        self.idle_workers = trollius.Queue()
+        for worker in self.workers:
+            self.idle_workers.put_nowait(worker)
 
     @trollius.coroutine
     def get_snapshot_data(self):
         """
+        Adds the experiment state and the current sizes of the
+        output files, which are truncated to these sizes on restore.
         :return:
         """
         data = yield From(super(OfflineEvoManager, self).get_snapshot_data())
         data.update(self._snapshot_data)
+
+        for name, f in self.outputs.iteritems():
+            f.flush()
+            data['%s_offset' % name] = os.fstat(f.fileno()).st_size
+
         raise Return(data)
 
     @trollius.coroutine
@@ -164,12 +317,33 @@ class OfflineEvoManager(World):
         :param parents:
         :return: Evaluated Robot object
         """
+        robots = yield From(self.evaluate_batch([tree], [bbox], [parents]))
+        raise Return(robots[0])
+
+    @trollius.coroutine
+    def evaluate_batch(self, trees, bboxes, parents, threshold=None, cut_short=None):
+        """
+        Evaluates a number of robot trees concurrently, each
+        in a separate slot of the evaluation grid.
+        :param trees:
+        :param bboxes:
+        :param parents:
+        :param threshold: Fitness to beat when racing, robots that cannot
+                          reach it are removed before their evaluation ends.
+        :param cut_short: Dictionary in which the simulation time saved
+                          on removed robots is stored by robot name.
+        :return: List of evaluated Robot objects
+        """
         # Pause the world just in case it wasn't already
         yield From(wait_for(self.pause(True)))
 
-        pose = Pose(position=Vector3(0, 0, -bbox.min.z))
-        fut = yield From(self.insert_robot(tree, pose, parents))
-        robot = yield From(fut)
+        robots = []
+        slots = slot_positions(len(trees), self.conf.slot_spacing)
+        for tree, bbox, par, (x, y) in itertools.izip(trees, bboxes, parents, slots):
+            pose = Pose(position=Vector3(x, y, -bbox.min.z))
+            fut = yield From(self.insert_robot(tree, pose, par))
+            robot = yield From(fut)
+            robots.append(robot)
 
         max_age = self.conf.evaluation_time + self.conf.warmup_time
 
@@ -178,47 +352,175 @@ class OfflineEvoManager(World):
 
         before = time.time()
 
-        while True:
-            if robot.age() >= max_age:
-                break
-
-            # Sleep for the pose update frequency, which is about when
-            # we expect a new age update.
-            yield From(trollius.sleep(1.0 / self.pose_update_frequency))
+        racing = self.conf.racing and threshold is not None
+        pending = list(robots)
+        while pending:
+            # Robot age is only updated with pose updates, so this
+            # may take one extra update.
+            remain = max_age - min(float(robot.age()) for robot in pending)
+            yield From(self.sleep_sim(min(remain, self.conf.racing_interval) if racing else remain))
+
+            finished = [robot for robot in pending if robot.age() >= max_age]
+            if finished:
+                # Pause before removing the finished robots, so their
+                # evaluation ends with the update that completed it.
+                yield From(wait_for(self.pause(True)))
+                for robot in finished:
+                    pending.remove(robot)
+                    yield From(wait_for(self.delete_robot(robot)))
+
+                if pending:
+                    yield From(wait_for(self.pause(False)))
+
+            for robot in list(pending):
+                if racing and robot.fitness_bound(self.conf.racing_max_speed) < threshold:
+                    saved = max_age - float(robot.age())
+                    print("Evaluation of `%s` cut short, saving %.2f simulation seconds." %
+                          (robot.name, saved))
+                    if cut_short is not None:
+                        cut_short[robot.name] = saved
+
+                    pending.remove(robot)
+                    yield From(wait_for(self.delete_robot(robot)))
 
-        yield From(wait_for(self.delete_robot(robot)))
         yield From(wait_for(self.pause(True)))
 
+        # The threshold is per evaluation, concurrent evaluations
+        # share a single window.
         diff = time.time() - before
-        if diff > self.conf.evaluation_threshold:
+        if diff > self.conf.evaluation_threshold * len(robots):
             sys.stderr.write("Evaluation threshold exceeded, shutting down with nonzero status code.\n")
             sys.exit(1)
 
-        raise Return(robot)
+        raise Return(robots)
 
     @trollius.coroutine
-    def evaluate_population(self, trees, bboxes, parents=None):
+    def evaluate_population(self, trees, bboxes, parents=None, threshold=None):
         """
         :param trees:
         :param bboxes:
         :param parents:
+        :param threshold: Fitness to beat when racing, see `evaluate_batch`.
+                          The robots that were cut short are added to `cut_short`.
         :return:
         """
         if parents is None:
             parents = [None for _ in trees]
 
-        pairs = []
+        cache = self.fitness_cache
+        if cache:
+            # Only evaluate genomes without enough evaluations
+            keys = [genome_key(tree.to_robot(0)) for tree in trees]
+            planned = {}
+            jobs = []
+            for i, key in enumerate(keys):
+                if cache.needs_evaluation(key, planned.get(key, 0)):
+                    planned[key] = planned.get(key, 0) + 1
+                    jobs.append(i)
+        else:
+            keys = None
+            jobs = range(len(trees))
+
+        n = max(1, self.conf.evaluation_slots)
         print("Evaluating population...")
-        for tree, bbox, par in itertools.izip(trees, bboxes, parents):
-            print("Evaluating individual...")
-            before = time.time()
-            robot = yield From(self.evaluate_pair(tree, bbox, par))
-            pairs.append((robot, time.time() - before))
-            print("Done.")
+
+        # Batches are dispatched to whichever worker is idle,
+        # the results are collected in population order.
+        job_trees = [trees[i] for i in jobs]
+        job_bboxes = [bboxes[i] for i in jobs]
+        job_parents = [parents[i] for i in jobs]
+        tasks = [trollius.Task(self.dispatch_batch(job_trees[i:i + n], job_bboxes[i:i + n],
+                                                   job_parents[i:i + n], threshold))
+                 for i in range(0, len(jobs), n)]
+        results = yield From(trollius.gather(*tasks))
+        evaluated = dict(zip(jobs, itertools.chain.from_iterable(results)))
 
         print("Done evaluating population.")
+        if not cache:
+            raise Return([evaluated[i] for i in jobs])
+
+        for i in jobs:
+            robot = evaluated[i][0]
+            if robot.name not in self.cut_short:
+                cache.add(keys[i], robot)
+
+        pairs = []
+        for i, key in enumerate(keys):
+            if i in evaluated:
+                cache.misses += 1
+                pairs.append(evaluated[i])
+            elif cache.robots(key):
+                pairs.append((self.reuse_evaluation(key, trees[i], parents[i]), 0.0))
+
+            # Otherwise all evaluations of this genome were
+            # cut short, so it could not survive either.
+
+        print("Reused %d evaluation(s) of identical genomes." % (len(trees) - len(jobs)))
         raise Return(pairs)
 
+    def reuse_evaluation(self, key, tree, parents):
+        """
+        Creates a new individual for a genome in the fitness cache. It
+        gets its own robot ID and the given tree and parents, but shares
+        the evaluation, and thus the fitness, of the last evaluated robot
+        with the same genome.
+        :param key:
+        :param tree:
+        :param parents:
+        :return:
+        """
+        robot = copy.copy(self.fitness_cache.robots(key)[-1])
+        robot.robot = tree.to_robot(self.get_robot_id())
+        robot.name = "gen__%d" % robot.robot.id
+        robot.tree = tree
+        robot.parents = parents
+        robot.mated_with = {}
+        robot.cache = {}
+        self.fitness_cache.reuse(key, robot)
+        return robot
+
+    def log_fitness_cache_stats(self):
+        """
+        Logs the hits and misses of the fitness cache.
+        :return:
+        """
+        cache = self.fitness_cache
+        if cache:
+            logger.debug("Fitness cache: %d hits, %d misses, hit rate %.2f, %d genomes." % (
+                cache.hits, cache.misses, cache.hit_rate(), len(cache.entries)))
+
+    def genome_fitness(self, robot):
+        """
+        :param robot:
+        :return: Fitness used for selection, which is averaged over all
+                 evaluations of the robot's genome if the fitness cache is used.
+        """
+        return self.fitness_cache.fitness(robot) if self.fitness_cache else robot.fitness()
+
+    @trollius.coroutine
+    def dispatch_batch(self, trees, bboxes, parents, threshold=None):
+        """
+        Evaluates a batch of robot trees on the first idle worker.
+        :param trees:
+        :param bboxes:
+        :param parents:
+        :param threshold:
+        :return: List of tuples (robot, evaluation wallclock time)
+        """
+        worker = yield From(self.idle_workers.get())
+        try:
+            print("Evaluating %d individual(s)..." % len(trees))
+            before = time.time()
+            robots = yield From(worker.evaluate_batch(trees, bboxes, parents,
+                                                      threshold, self.cut_short))
+            print("Done.")
+        finally:
+            self.idle_workers.put_nowait(worker)
+
+        # Report the share of the evaluation window of each robot
+        t_eval = (time.time() - before) / len(robots)
+        raise Return([(robot, t_eval) for robot in robots])
+
     @trollius.coroutine
     def produce_generation(self, parents):
         """
@@ -234,20 +536,172 @@ class OfflineEvoManager(World):
 
         while len(trees) < self.conf.num_children:
             print("Producing individual...")
+            tree, bbox, pair = yield From(self.produce_child(parents))
+            trees.append(tree)
+            bboxes.append(bbox)
+            parent_pairs.append(pair)
+            print("Done.")
+
+        print("Done producing generation.")
+        raise Return(trees, bboxes, parent_pairs)
+
+    @trollius.coroutine
+    def produce_child(self, parents):
+        """
+        Produces a single child of two parents selected from
+        the given robots.
+        :param parents:
+        :return: Tuple of tree, bounding box and parent pair
+        """
+        while True:
             p1, p2 = select_parents(parents)
 
             for j in xrange(self.conf.max_mating_attempts):
                 pair = yield From(self.attempt_mate(p1, p2))
                 if pair:
-                    trees.append(pair[0])
-                    bboxes.append(pair[1])
-                    parent_pairs.append((p1, p2))
-                    break
+                    raise Return(pair[0], pair[1], (p1, p2))
 
-            print("Done.")
+    @trollius.coroutine
+    def run_steady_state(self, evo, gen_start, pairs):
+        """
+        Runs a single evolution in the asynchronous steady state mode. The
+        number of evaluations equals that of the generational mode, every
+        `num_children` completed evaluations form a virtual generation.
+        :param evo:
+        :param gen_start: Virtual generation to start at
+        :param pairs: Initial population
+        :return:
+        """
+        conf = self.conf
+        n = conf.num_children
+        total = (conf.num_generations - 1) * n
+        completed = started = (gen_start - 1) * n
+        slots = max(1, conf.evaluation_slots)
+        running = {}
+
+        # Like the generational mode, snapshot before every fifth
+        # virtual generation.
+        snapshots = [(g - 1) * n for g in range(5, conf.num_generations, 5) if (g - 1) * n > completed]
+
+        # The population is kept in insertion order, so that with the
+        # comma strategy a child replaces the oldest robot.
+        pairs = list(pairs)
+        children = []
+
+        while completed < total:
+            # Don't start evaluations beyond the next snapshot, so
+            # that the world is empty when it is created.
+            limit = snapshots[0] if snapshots else total
+            while len(running) < len(self.workers) and started < limit:
+                # Fill all evaluation slots of the worker
+                trees, bboxes, parents = [], [], []
+                for _ in range(min(slots, limit - started)):
+                    if conf.disable_evolution:
+                        new_trees, new_bboxes = yield From(self.generate_population(1))
+                        tree, bbox, pair = new_trees[0], new_bboxes[0], None
+                    else:
+                        tree, bbox, pair = yield From(self.produce_child([p[0] for p in pairs]))
+
+                    trees.append(tree)
+                    bboxes.append(bbox)
+                    parents.append(pair)
+
+                threshold = None
+                if conf.keep_parents and len(pairs) >= conf.population_size:
+                    threshold = min(self.genome_fitness(p[0]) for p in pairs)
+
+                task = trollius.Task(self.evaluate_population(trees, bboxes, parents, threshold))
+                running[task] = len(trees)
+                started += len(trees)
+
+            done, _ = yield From(trollius.wait(running.keys(), return_when=trollius.FIRST_COMPLETED))
+            for task in done:
+                num = running.pop(task)
+                results = task.result()
+                for i in range(num):
+                    # Genomes of which all earlier evaluations were cut
+                    # short are not in the results, see `evaluate_population`.
+                    if i < len(results):
+                        robot, t_eval = results[i]
+                        self.log_evaluation(evo, completed, completed // n + 1, robot, t_eval)
+                        children.append(robot)
+
+                        if robot.name not in self.cut_short:
+                            pairs = self.insert_child(pairs, (robot, t_eval))
+
+                    completed += 1
+                    if completed % n == 0:
+                        self.log_racing(evo, completed // n, children)
+                        self.log_generation(evo, completed // n, pairs)
+                        children = []
+
+            if snapshots and completed == snapshots[0] and not running:
+                snapshots.pop(0)
+                self._snapshot_data = {
+                    "local_pairs": pairs,
+                    "gen_start": completed // n + 1,
+                    "evo_start": evo,
+                    "fitness_cache": self.fitness_cache
+                }
+                yield From(self.create_snapshot())
+                print("Created snapshot of experiment state.")
+
+    def insert_child(self, pairs, pair):
+        """
+        Inserts an evaluated child in the population, with plus
+        selection it replaces the worst robot if it is better,
+        otherwise it replaces the oldest robot.
+        :param pairs: Population of (robot, evaluation time) tuples
+        :param pair:
+        :return: New population
+        """
+        pairs = pairs + [pair]
+        if len(pairs) <= self.conf.population_size:
+            return pairs
 
-        print("Done producing generation.")
-        raise Return(trees, bboxes, parent_pairs)
+        if self.conf.keep_parents:
+            worst = min(pairs, key=lambda r: self.genome_fitness(r[0]))
+            pairs.remove(worst)
+            return pairs
+
+        return pairs[1:]
+
+    def log_evaluation(self, evo, index, generation, robot, t_eval):
+        """
+        Logs a completed evaluation of a child.
+        :param evo:
+        :param index: Index of the evaluation in order of completion
+        :param generation: The (virtual) generation of the child
+        :param robot:
+        :param t_eval:
+        :return:
+        """
+        if not self.write_evaluations:
+            return
+
+        t_saved = self.cut_short.get(robot.name)
+        row = [evo, index, generation, robot.robot.id]
+        row += [p.robot.id for p in robot.parents] if robot.parents else ['', '']
+        row += [robot.velocity(), robot.displacement_velocity(), robot.fitness(), t_eval,
+                int(t_saved is not None), t_saved or 0.0]
+        self.write_evaluations.writerow(row)
+
+    def log_racing(self, evo, generation, robots):
+        """
+        Logs the number of evaluations cut short by racing in
+        a (virtual) generation and the simulation time saved.
+        :param evo:
+        :param generation:
+        :param robots: The evaluated children of the generation
+        :return:
+        """
+        saved = [self.cut_short[r.name] for r in robots if r.name in self.cut_short]
+        if saved:
+            print("Racing cut short %d evaluation(s) in generation %d, saving %.2f "
+                  "simulation seconds." % (len(saved), generation, sum(saved)))
+
+        if self.write_racing:
+            self.write_racing.writerow([evo, generation, len(robots), len(saved), sum(saved)])
 
     def log_generation(self, evo, generation, pairs):
         """
@@ -257,7 +711,8 @@ class OfflineEvoManager(World):
         :return:
         """
         print("================== GENERATION %d ==================" % generation)
-        if not self.generations_file:
+        self.log_fitness_cache_stats()
+        if not self.write_generations:
             return
 
         for robot, t_eval in pairs:
@@ -277,6 +732,9 @@ class OfflineEvoManager(World):
             evo_start = data['evo_start']
             gen_start = data['gen_start']
             pairs = data['local_pairs']
+
+            if self.fitness_cache and data.get('fitness_cache'):
+                self.fitness_cache = data['fitness_cache']
         else:
             # Start at the first experiment
             evo_start = 1
@@ -284,6 +742,13 @@ class OfflineEvoManager(World):
             pairs = None
 
         for evo in range(evo_start, conf.num_evolutions + 1):
+            self.cut_short = {}
+
+            # Evaluations of earlier runs are not reused, so that
+            # the runs remain independent repetitions.
+            if self.fitness_cache and evo != evo_start:
+                self.fitness_cache.clear()
+
             if not pairs:
                 # Only create initial population if we are not restoring from
                 # a previous experiment.
@@ -291,13 +756,20 @@ class OfflineEvoManager(World):
                 pairs = yield From(self.evaluate_population(trees, bboxes))
                 self.log_generation(evo, 0, pairs)
 
+            if conf.steady_state:
+                yield From(self.run_steady_state(evo, gen_start, pairs))
+                gen_start = 1
+                pairs = None
+                continue
+
             for generation in xrange(gen_start, conf.num_generations):
                 if (generation % 5) == 0:
                     # Snapshot every 2 generations
                     self._snapshot_data = {
                         "local_pairs": pairs,
                         "gen_start": generation,
-                        "evo_start": evo
+                        "evo_start": evo,
+                        "fitness_cache": self.fitness_cache
                     }
                     yield From(self.create_snapshot())
                     print("Created snapshot of experiment state.")
@@ -311,7 +783,23 @@ class OfflineEvoManager(World):
                 else:
                     child_trees, child_bboxes, parent_pairs = yield From(self.produce_generation(robots))
 
-                child_pairs = yield From(self.evaluate_population(child_trees, child_bboxes, parent_pairs))
+                # With plus selection a child has to beat the worst survivor
+                threshold = None
+                if conf.keep_parents and len(pairs) >= conf.population_size:
+                    threshold = min(self.genome_fitness(p[0]) for p in pairs)
+
+                child_pairs = yield From(self.evaluate_population(child_trees, child_bboxes,
+                                                                  parent_pairs, threshold))
+
+                first = (generation - 1) * len(child_trees)
+                for i, (robot, t_eval) in enumerate(child_pairs):
+                    self.log_evaluation(evo, first + i, generation, robot, t_eval)
+
+                self.log_racing(evo, generation, [p[0] for p in child_pairs])
+
+                # Their partial fitness is not comparable, but they
+                # could not have beaten the worst survivor.
+                child_pairs = [p for p in child_pairs if p[0].name not in self.cut_short]
 
                 if conf.keep_parents:
                     pairs += child_pairs
@@ -319,7 +807,8 @@ class OfflineEvoManager(World):
                     pairs = child_pairs
 
                 # Sort the bots and reduce to population size
-                pairs = sorted(pairs, key=lambda r: r[0].fitness(), reverse=True)[:conf.population_size]
+                pairs = sorted(pairs, key=lambda r: self.genome_fitness(r[0]),
+                               reverse=True)[:conf.population_size]
                 self.log_generation(evo, generation, pairs)
 
             # Clear "restore" parameters
@@ -333,9 +822,12 @@ class OfflineEvoManager(World):
         """
         :return:
         """
+        for worker in self.workers[1:]:
+            yield From(worker.teardown())
+
         yield From(super(OfflineEvoManager, self).teardown())
-        if self.generations_file:
-            self.generations_file.close()
+        for f in self.outputs.itervalues():
+            f.close()
 
 
 def select_parent(parents):
@@ -1,5 +1,8 @@
 import os
 import sys
+import shutil
+import tempfile
+from multiprocessing import Process
 
 here = os.path.dirname(os.path.abspath(__file__))
 tol_path = os.path.abspath(os.path.join(here, '..', '..'))
@@ -7,20 +10,106 @@ rv_path = os.path.abspath(os.path.join(tol_path, '..', 'revolve'))
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from revolve.util import Supervisor
+from tol.config import str_to_address, instance_address
 from offline_evolve import parser
 
-args = parser.parse_args()
-
 os.environ['GAZEBO_PLUGIN_PATH'] = os.path.join(tol_path, 'build')
 os.environ['GAZEBO_MODEL_PATH'] = os.path.join(tol_path, 'tools', 'models')
 
-supervisor = Supervisor(
-    manager_cmd=[sys.executable, "offline_evolve.py"],
-    analyzer_cmd=os.path.join(rv_path, 'tools', 'analyzer', 'run-analyzer'),
-    world_file=os.path.join(here, 'offline-evolve.world'),
-    output_directory=args.output_directory,
-    manager_args=sys.argv[1:],
-    restore_directory=args.restore_directory
-)
+manager_cmd = [sys.executable, "offline_evolve.py"]
+worker_cmd = [sys.executable, "worker.py"]
+analyzer_cmd = os.path.join(rv_path, 'tools', 'analyzer', 'run-analyzer')
+world_file = os.path.join(here, 'offline-evolve.world')
+
+
+def master_uri(address):
+    """
+    :param address: Host:port string
+    :return: Gazebo master URI for the given address
+    """
+    return "http://%s:%d" % str_to_address(address)
+
+
+def instance_analyzer_cmd(address):
+    """
+    Returns the command for an analyzer at the given address. Gazebo
+    servers pick their port from `GAZEBO_MASTER_URI`, so an analyzer
+    on a non-default port is started with that variable set.
+    :param address:
+    :return:
+    """
+    if not address:
+        return None
+
+    if address == parser.get_default('analyzer_address'):
+        return analyzer_cmd
+
+    return ['env', 'GAZEBO_MASTER_URI=' + master_uri(address), analyzer_cmd]
+
+
+def run_worker(args, index, main_pid, stop_file):
+    """
+    Supervises the simulator / analyzer pair of an additional evaluation
+    worker, in a process of its own. The pair is launched by a regular
+    supervisor at the worker's addresses, with an idle manager that
+    exits once the experiment is stopped. If any of the worker's
+    processes fails, the worker alone is relaunched with a clean world.
+    :param args:
+    :param index:
+    :param main_pid:
+    :param stop_file:
+    :return:
+    """
+    os.environ['GAZEBO_MASTER_URI'] = master_uri(instance_address(args.world_address, index))
+    output_directory = os.path.join(args.output_directory, 'worker-%d' % index) \
+        if args.output_directory else None
+
+    while not os.path.exists(stop_file):
+        supervisor = Supervisor(
+            manager_cmd=worker_cmd,
+            analyzer_cmd=instance_analyzer_cmd(instance_address(args.analyzer_address, index)),
+            world_file=world_file,
+            output_directory=output_directory,
+            manager_args=['--main-pid', str(main_pid), '--stop-file', stop_file]
+        )
+        supervisor.launch()
+
+
+def main():
+    args = parser.parse_args()
+    if args.world_address != parser.get_default('world_address'):
+        os.environ['GAZEBO_MASTER_URI'] = master_uri(args.world_address)
+
+    # Creating this file stops the worker supervisors
+    stop_dir = tempfile.mkdtemp()
+    stop_file = os.path.join(stop_dir, 'stop')
+
+    workers = [Process(target=run_worker, args=(args, i, os.getpid(), stop_file),
+                       name='worker-%d' % i)
+               for i in range(1, args.evaluation_workers)]
+    for worker in workers:
+        worker.start()
+
+    supervisor = Supervisor(
+        manager_cmd=manager_cmd,
+        analyzer_cmd=instance_analyzer_cmd(args.analyzer_address),
+        world_file=world_file,
+        output_directory=args.output_directory,
+        manager_args=sys.argv[1:],
+        restore_directory=args.restore_directory
+    )
+
+    try:
+        supervisor.launch()
+    finally:
+        open(stop_file, 'w').close()
+        for worker in workers:
+            worker.join(30)
+            if worker.is_alive():
+                worker.terminate()
+
+        shutil.rmtree(stop_dir, ignore_errors=True)
+
 
-supervisor.launch()
+if __name__ == '__main__':
+    main()
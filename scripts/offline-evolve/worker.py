@@ -0,0 +1,55 @@
+"""
+Manager process of an additional evaluation worker, launched by the
+worker's supervisor in `start.py`. The evaluations are run from the
+main manager, which connects to the worker's simulator / analyzer pair
+directly, so this process only keeps the worker's supervisor running.
+It exits normally, which makes the supervisor terminate the worker's
+simulator and analyzer, once the experiment is stopped.
+"""
+import os
+import time
+import argparse
+
+parser = argparse.ArgumentParser(description="Evaluation worker manager")
+parser.add_argument(
+    '--main-pid',
+    type=int, required=True,
+    help="Process ID of the main supervisor, the worker stops when it is gone."
+)
+
+parser.add_argument(
+    '--stop-file',
+    type=str, required=True,
+    help="The worker stops when this file exists."
+)
+
+parser.add_argument(
+    '--poll-interval',
+    default=1.0, type=float,
+    help="Interval in seconds at which the stop conditions are checked."
+)
+
+
+def running(pid):
+    """
+    :param pid:
+    :return: Whether a process with the given ID exists
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    return True
+
+
+def main():
+    # The supervisor passes its own arguments (e.g. the restore
+    # directory) to every manager, they have no meaning here.
+    args, _ = parser.parse_known_args()
+    while running(args.main_pid) and not os.path.exists(args.stop_file):
+        time.sleep(args.poll_interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Converts the binary fitness, summary and deaths logs written
+with `--log-format binary` to CSV files in the same directory.
+"""
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from tol.logging import export_csv
+
+parser = argparse.ArgumentParser(description="Export binary online evolution logs to CSV.")
+parser.add_argument('directory', help="Output directory of the online evolution experiment.")
+
+
+def main():
+    args = parser.parse_args()
+    for name in ('fitness', 'summary', 'deaths'):
+        filename = os.path.join(args.directory, name + '.bin')
+        if os.path.exists(filename):
+            export_csv(filename, os.path.join(args.directory, name + '.csv'))
+            print("Exported `%s`." % filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,10 @@ Online evolution experiment. Initially we try to answer the following questions:
   initial / max population size, age of death.
 """
 import csv
+import heapq
 import logging
 import sys
 
-import itertools
-
 import math
 import random
 
@@ -20,18 +19,18 @@ from sdfbuilder import Pose
 from sdfbuilder.math import Vector3
 
 import os
-import shutil
 import trollius
 from trollius import From, Return
-from revolve.util import multi_future, wait_for, Time
+from revolve.util import multi_future, wait_for
 
 # ToL imports may require the system path
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
 
-from tol.manage.robot import Robot
+from tol.manage.mating import MateIndex
+from tol.manage.offspring import OffspringPipeline
 from tol.config import parser
 from tol.manage import World
-from tol.logging import logger, output_console
+from tol.logging import logger, output_console, ColumnLog, LogWriter
 
 # Output to console and enable debug logging
 output_console()
@@ -50,6 +49,57 @@ parser.add_argument(
     help="The number of segments the arena wall will consist off."
 )
 
+parser.add_argument(
+    '--check-aggregates',
+    default=False, type=lambda v: v.lower() == "true" or v == "1",
+    help="Debug mode in which the incrementally kept population totals are "
+         "compared with a full recomputation whenever the summary is logged."
+)
+
+parser.add_argument(
+    '--offspring-buffer',
+    default=0, type=int,
+    help="Number of viable children produced ahead of time in the background for "
+         "eligible parent pairs. With 0 children are produced when reproducing."
+)
+
+parser.add_argument(
+    '--parallel-instances',
+    default=1, type=int,
+    help="Number of simulator / analyzer pairs used by `parallel.py` to run "
+         "repetitions concurrently. Pair `i` uses the ports of `--world-address` "
+         "and `--analyzer-address` plus 2 * i."
+)
+
+parser.add_argument(
+    '--log-format',
+    default='csv', choices=['csv', 'binary'],
+    help="Format of the fitness, summary and deaths logs. Binary logs "
+         "can be converted with `export_logs.py`."
+)
+
+parser.add_argument(
+    '--log-chunk-size',
+    default=1024, type=int,
+    help="Number of log rows that are buffered before they are "
+         "handed to the background writer."
+)
+
+parser.add_argument(
+    '--log-flush-interval',
+    default=10.0, type=float,
+    help="Simulation seconds after which buffered log rows are handed to the "
+         "background writer regardless of their number, this bounds the rows "
+         "lost when the experiment crashes."
+)
+
+parser.add_argument(
+    '--single-model-arena',
+    default=False, type=lambda v: v.lower() == "true" or v == "1",
+    help="Insert the arena wall as a single model with one link per segment, "
+         "rather than as one model per wall segment."
+)
+
 parser.add_argument(
     '--birth-clinic-diameter',
     default=3.0, type=float,
@@ -186,17 +236,18 @@ class OnlineEvoManager(World):
         """
         super(OnlineEvoManager, self).__init__(conf, _private)
 
-        # Output files
-        csvs = {
-            'fitness': ['run', 't_sim', 'robot_id', 'age', 'displacement',
-                        'vel', 'dvel', 'fitness', 'charge', 'size'],
-            'summary': ['run', 'world_age', 'charge', 'robot_count', 'part_count',
-                        'births', 'deaths'],
-            'deaths': ['run', 'world_age', 'robot_id', 'x', 'y', 'z']
+        # Output files, as (name, array typecode) columns
+        logs = {
+            'fitness': [('run', 'l'), ('t_sim', 'd'), ('robot_id', 'l'), ('age', 'd'),
+                        ('displacement', 'd'), ('vel', 'd'), ('dvel', 'd'),
+                        ('fitness', 'd'), ('charge', 'd'), ('size', 'l')],
+            'summary': [('run', 'l'), ('world_age', 'd'), ('charge', 'd'), ('robot_count', 'l'),
+                        ('part_count', 'd'), ('births', 'l'), ('deaths', 'l')],
+            'deaths': [('run', 'l'), ('world_age', 'd'), ('robot_id', 'l'),
+                       ('x', 'd'), ('y', 'd'), ('z', 'd')]
         }
-        self.csv_files = {k: {'filename': None, 'file': None, 'csv': None,
-                              'header': csvs[k]}
-                          for k in csvs}
+        self.logs = {k: None for k in logs}
+        self.log_writer = None
 
         data = self.do_restore
         if self.do_restore:
@@ -212,21 +263,25 @@ class OnlineEvoManager(World):
             self.births = 0
             self.deaths = 0
 
-        if self.output_directory:
-            for k in self.csv_files:
-                fname = os.path.join(self.output_directory, k+'.csv')
-                self.csv_files[k]['filename'] = fname
-                if self.do_restore:
-                    shutil.copy(fname + '.snapshot', fname)
-                    f = open(fname, 'ab', buffering=1)
-                else:
-                    f = open(fname, 'wb', buffering=1)
+        # Heap of (depletion time, robot name) tuples of all robots
+        # in the world, see `schedule_death`.
+        self.death_queue = []
 
-                self.csv_files[k]['file'] = f
-                self.csv_files[k]['csv'] = csv.writer(f, delimiter=',')
+        self.offspring = OffspringPipeline(self, conf.offspring_buffer, self.select_pair) \
+            if conf.offspring_buffer > 0 else None
 
-                if not self.do_restore:
-                    self.csv_files[k]['csv'].writerow(self.csv_files[k]['header'])
+        if self.output_directory:
+            binary = conf.log_format == 'binary'
+            self.log_writer = LogWriter()
+            for k in logs:
+                fname = os.path.join(self.output_directory, k + ('.bin' if binary else '.csv'))
+                self.logs[k] = ColumnLog(fname, logs[k], self.log_writer, binary=binary,
+                                         chunk_size=conf.log_chunk_size,
+                                         append=bool(self.do_restore))
+
+                if self.do_restore and k in data.get('log_offsets', {}):
+                    # Discard the rows written after the snapshot
+                    self.logs[k].truncate(data['log_offsets'][k])
 
     @classmethod
     @trollius.coroutine
@@ -248,9 +303,12 @@ class OnlineEvoManager(World):
         """
         yield From(super(OnlineEvoManager, self).teardown())
 
-        for k in self.csv_files:
-            if self.csv_files[k]['file']:
-                self.csv_files[k]['file'].close()
+        for log in self.logs.values():
+            if log:
+                log.close()
+
+        if self.log_writer:
+            self.log_writer.stop()
 
     @trollius.coroutine
     def get_snapshot_data(self):
@@ -261,26 +319,13 @@ class OnlineEvoManager(World):
         data.update({
             'current_run': self.current_run,
             'current_charge': self.current_charge,
-            'last_charge_update': self.last_charge_update
+            'last_charge_update': self.last_charge_update,
+            'births': self.births,
+            'deaths': self.deaths,
+            'log_offsets': {k: log.offset() for k, log in self.logs.items() if log}
         })
         raise Return(data)
 
-    @trollius.coroutine
-    def create_snapshot(self):
-        """
-        Copy the fitness file in the snapshot
-        :return:
-        """
-        ret = yield From(super(OnlineEvoManager, self).create_snapshot())
-        if not ret:
-            raise Return(ret)
-
-        for k in self.csv_files:
-            entry = self.csv_files[k]
-            if entry['file']:
-                entry['file'].flush()
-                shutil.copy(entry['filename'], entry['filename'] + '.snapshot')
-
     @trollius.coroutine
     def build_arena(self):
         """
@@ -294,37 +339,59 @@ class OnlineEvoManager(World):
         r = self.conf.world_diameter * 0.5
         frac = 2 * math.pi / n
         points = [Vector3(r * math.cos(i * frac), r * math.sin(i * frac), 0) for i in range(n)]
-        fut = yield From(self.build_walls(points))
+        fut = yield From(self.build_walls(points, single_model=self.conf.single_model_arena))
         futs.append(fut)
         raise Return(multi_future(futs))
 
-    def select_parents(self):
+    def mate_index(self):
+        """
+        :return: Index of the current mating candidates, see `MateIndex`.
+        :rtype: MateIndex
+        """
+        return MateIndex(self.robots.values(), self.conf)
+
+    def select_parents(self, index=None):
         """
         Returns a list of robots that have at least one potential mate.
 
+        :param index: Mate index to use, created if not given
         :return:
         """
-        return [ra for ra, _ in self.select_mates()]
+        return [ra for ra, _ in self.select_mates(index)]
+
+    def select_pair(self):
+        """
+        Picks a random robot with at least one potential mate along
+        with its optimal mate.
+        :return: (ra, rb) tuple, or `None` if no robot has a potential mate
+        """
+        index = self.mate_index()
+        potential_parents = self.select_parents(index)
+        if not potential_parents:
+            return None
+
+        ra = random.choice(potential_parents)
+        return ra, self.select_optimal_mate(ra, index)
 
-    def select_optimal_mate(self, ra):
+    def select_optimal_mate(self, ra, index=None):
         """
         Given a robot, selects the optimal mate. If you call this method
         for a robot without any potential mate you will get an `IndexError`.
         :param ra:
         :type ra: Robot
+        :param index: Mate index to use, created if not given
         :return:
         """
-        return sorted([rb for rb in self.robots.values()
-                       if ra is not rb and ra.will_mate_with(rb) and rb.will_mate_with(ra)],
-                      key=lambda r: r.fitness(), reverse=True)[-1]
+        mates = (index or self.mate_index()).mates(ra)
+        return sorted(mates, key=lambda r: r.fitness(), reverse=True)[-1]
 
-    def select_mates(self):
+    def select_mates(self, index=None):
         """
         Finds all mate combinations in the current arena.
+        :param index: Mate index to use, created if not given
         :return:
         """
-        return [(ra, rb) for ra, rb in itertools.combinations(self.robots.values(), 2)
-                if ra.will_mate_with(rb) and rb.will_mate_with(ra)]
+        return (index or self.mate_index()).pairs()
 
     @trollius.coroutine
     def birth(self, tree, bbox, parents):
@@ -358,11 +425,7 @@ class OnlineEvoManager(World):
             pos.x = radius * math.cos(angle)
             pos.y = radius * math.sin(angle)
 
-            done = True
-            for robot in self.robots.values():
-                if robot.distance_to(pos, planar=True) < min_drop:
-                    done = False
-                    break
+            done = not any(dist < min_drop for _, dist in self.robots_within(pos, min_drop))
 
             if done:
                 break
@@ -382,28 +445,58 @@ class OnlineEvoManager(World):
         fut = yield From(self.insert_robot(tree, Pose(position=pos), parents=parents))
         raise Return(fut)
 
+    def schedule_death(self, robot):
+        """
+        Schedules the death of the given robot. A robot's charge decreases
+        linearly with its age, so the world age at which its battery is
+        empty is known as soon as it is born. The robot's remaining
+        lifetime is converted to world age, which is what the queue is
+        checked against.
+        :param robot:
+        :type robot: Robot
+        :return:
+        """
+        remaining = robot.initial_charge / robot.size - float(robot.age())
+        heapq.heappush(self.death_queue, (float(self.age()) + remaining, robot.name))
+
     @trollius.coroutine
     def kill_old_robots(self):
         """
-        Kills old robots, returns a list of futures of all
-        delete requests (robots should be deleted once these
+        Kills the robots whose battery has run out, returns a list of
+        futures of all delete requests (robots should be deleted once these
         are resolved).
         :return:
         """
         futs = []
-        write_deaths = self.csv_files['deaths']['csv']
+        deaths_log = self.logs['deaths']
+        queue = self.death_queue
+        now = float(self.age())
+
+        while queue and queue[0][0] <= now:
+            _, name = heapq.heappop(queue)
+            robot = self.robots.get(name)
+            if not robot:
+                # Robot was already removed
+                continue
 
-        for robot in self.robots.values():
-            if robot.charge() <= 0:
-                print("Robot `%s` has an empty battery and will be removed." % robot.name)
-                fut = yield From(self.delete_robot(robot))
-                futs.append(fut)
-                self.deaths += 1
+            if robot.charge() > 0:
+                # The robot's own clock lags behind the world age, it
+                # dies once its charge as computed from its age is gone.
+                self.schedule_death(robot)
+                continue
+
+            print("Robot `%s` has an empty battery and will be removed." % robot.name)
+            fut = yield From(self.delete_robot(robot))
+            futs.append(fut)
+            self.deaths += 1
+
+            if self.offspring:
+                self.offspring.invalidate(robot)
 
-                if write_deaths:
-                    write_deaths.writerow((self.current_run, self.age(),
-                                           robot.robot.id, robot.last_position.x,
-                                           robot.last_position.y, robot.last_position.z))
+            if deaths_log:
+                deaths_log.append((self.current_run, float(self.age()), robot.robot.id,
+                                   robot.last_position.x, robot.last_position.y,
+                                   robot.last_position.z))
 
         raise Return(futs)
 
@@ -421,7 +514,10 @@ class OnlineEvoManager(World):
         """
         # Keeping for compliance with old experiments, will set up to use actual battery level after this
         initial_charge = self.subtract_charge(self.calculate_initial_charge(parents))
-        return Robot(self.conf, robot_name, tree, robot, position, time, initial_charge, parents)
+        manager = super(OnlineEvoManager, self).create_robot_manager(
+            robot_name, tree, robot, position, time, initial_charge, parents)
+        self.schedule_death(manager)
+        return manager
 
     def subtract_charge(self, charge):
         """
@@ -487,42 +583,66 @@ class OnlineEvoManager(World):
         Returns the sum of the fitness of all robots in the system.
         :return:
         """
-        return reduce(lambda a, b: a + b.fitness(), self.robots.values(), 0.0)
+        return self.population_state.total('fitness')
 
     def total_size(self):
         """
         Returns the total size of all robots in the system.
         :return:
         """
-        return reduce(lambda a, b: a + b.size, self.robots.values(), 0.0)
+        return self.population_state.total('size')
+
+    def check_aggregates(self):
+        """
+        Compares the incrementally maintained population aggregates
+        with values computed from all robots, logging any difference.
+        :return: Whether all aggregates match
+        """
+        robots = self.robots.values()
+        expected = {
+            'robot_count': (len(self.population_state), len(robots)),
+            'part_count': (self.total_size(), sum(r.size for r in robots)),
+            'fitness': (self.total_fitness(), sum(r.fitness() for r in robots))
+        }
+
+        ok = True
+        for name, (value, actual) in sorted(expected.items()):
+            if abs(value - actual) > 1e-6 * max(1.0, abs(actual)):
+                logger.warning("Aggregate `%s` is %f, recomputed value is %f." % (name, value, actual))
+                ok = False
+
+        return ok
 
     def log_fitness(self):
         """
         :return:
         """
-        f = self.csv_files['fitness']['csv']
-        if not f:
+        log = self.logs['fitness']
+        if not log:
             return
 
         t = float(self.age())
         n = self.current_run
         for robot in self.robots.values():
             ds, dt = robot.displacement()
-            f.writerow([n, t, robot.robot.id,
-                        robot.age(), ds.norm(), robot.velocity(),
+            log.append((n, t, robot.robot.id,
+                        float(robot.age()), ds.norm(), robot.velocity(),
                         robot.displacement_velocity(), robot.fitness(),
-                        robot.charge(), robot.size])
+                        robot.charge(), robot.size))
 
     def log_summary(self):
         """
         :return:
         """
-        f = self.csv_files['summary']['csv']
-        if not f:
+        if self.conf.check_aggregates:
+            self.check_aggregates()
+
+        log = self.logs['summary']
+        if not log:
             return
 
-        f.writerow((self.current_run, self.age(), self.charge(),
-                   len(self.robots), self.total_size(), self.births, self.deaths))
+        log.append((self.current_run, float(self.age()), self.charge(),
+                    len(self.robots), self.total_size(), self.births, self.deaths))
 
     @trollius.coroutine
     def run(self):
@@ -545,7 +665,13 @@ class OnlineEvoManager(World):
         conf = self.conf
         insert_queue = []
 
-        if not self.do_restore:
+        self.death_queue = []
+        if self.do_restore:
+            # Robots restored from a snapshot were not created
+            # through `create_robot_manager`.
+            for robot in self.robots.values():
+                self.schedule_death(robot)
+        else:
             if self.current_run == 0:
                 # Only build arena on first run
                 yield From(wait_for(self.build_arena()))
@@ -560,86 +686,112 @@ class OnlineEvoManager(World):
             trees, bboxes = yield From(self.generate_population(conf.initial_population_size))
             insert_queue = zip(trees, bboxes, [None for _ in range(len(trees))])
 
-        # Simple loop timing mechanism
-        timers = {k: Time() for k in ['reproduce', 'death', 'snapshot',
-                                      'log_fitness', 'rtf', 'insert_queue']}
-        this = self
-
-        def timer(name, t):
-            """
-            :param t:
-            :param name:
-            :return:
-            """
-            if this.last_time is not None and float(this.last_time - timers[name]) > t:
-                timers[name] = this.last_time
-                return True
-
-            return False
-
-        # Some variables
-        real_time = time.time()
+        # Insert the first robot before starting the world
+        if insert_queue:
+            yield From(self.insert_next(insert_queue))
+
+        yield From(wait_for(self.pause(False)))
+
+        # Periodic tasks, in simulation seconds
+        real_time = [time.time()]
         rtf_interval = 10.0
-        sleep_time = 0.1
         run_result = 'unknown'
-        started = False
-
-        while True:
-            if insert_queue and (not started or timer('insert_queue', 1.0)):
-                tree, bbox, parents = insert_queue.pop()
-                res = yield From(self.birth(tree, bbox, parents))
-                if res:
-                    yield From(res)
-
-            if not started:
-                # Start the world
-                yield From(wait_for(self.pause(False)))
-                started = True
+        scheduler = self.scheduler
+        scheduler.clear()
 
+        def idle():
             # Perform operations only if there are no items
             # in the insert queue, makes snapshotting easier.
-            if insert_queue:
-                # Space out robot inserts with one simulation second
-                # to allow them to drop in case they are too close.
-                # Sleep for a very small interval every time until
-                # all inserts are done
-                yield From(trollius.sleep(0.01))
-                continue
+            return not insert_queue
 
-            if timer('snapshot', 100.0):
-                # Snapshot the world every 100 simulation seconds
+        @trollius.coroutine
+        def snapshot():
+            if idle():
                 yield From(self.create_snapshot())
                 yield From(wait_for(self.pause(False)))
 
-            if timer('death', 3.0):
-                # Kill off robots over their age every 5 simulation seconds
+        @trollius.coroutine
+        def death():
+            if idle():
                 futs = yield From(self.kill_old_robots())
                 if futs:
                     yield From(multi_future(futs))
 
-            if timer('reproduce', 3.0):
-                # Attempt a reproduction every 3 simulation seconds
-                potential_parents = self.select_parents()
-                if potential_parents:
-                    ra = random.choice(potential_parents)
-                    rb = self.select_optimal_mate(ra)
-                    result = yield From(self.attempt_mate(ra, rb))
-
-                    if result:
-                        child, bbox = result
-                        insert_queue.append((child, bbox, (ra, rb)))
-
-            if timer('log_fitness', 2.0):
-                # Log overall fitness every 2 simulation seconds
+        @trollius.coroutine
+        def reproduce():
+            if not idle():
+                return
+
+            if self.offspring:
+                # Take a child that was produced in the background
+                candidate = self.offspring.pop()
+                if candidate:
+                    insert_queue.append(candidate)
+                return
+
+            pair = self.select_pair()
+            if pair:
+                ra, rb = pair
+                result = yield From(self.attempt_mate(ra, rb))
+
+                if result:
+                    child, bbox = result
+                    insert_queue.append((child, bbox, (ra, rb)))
+
+        def log_fitness():
+            if idle():
                 self.log_fitness()
                 self.log_summary()
 
-            if timer('rtf', rtf_interval):
-                # Print RTF to screen every so often
-                nw = time.time()
-                diff = nw - real_time
-                real_time = nw
-                print("RTF: %f" % (rtf_interval / diff))
+        def flush_logs():
+            for log in self.logs.values():
+                if log:
+                    log.flush()
+
+        def rtf():
+            nw = time.time()
+            diff = nw - real_time[0]
+            real_time[0] = nw
+            print("RTF: %f" % (rtf_interval / diff))
+            for name, (calls, runtime) in sorted(scheduler.stats().items()):
+                logger.debug("Task `%s`: %d calls, %.3fs total." % (name, calls, runtime))
+
+            if self.offspring:
+                logger.debug("Offspring: %d ready, %d attempts, %d invalidated." % (
+                    len(self.offspring.ready), self.offspring.attempts, self.offspring.invalidated))
+
+        # Space out robot inserts with one simulation second
+        # to allow them to drop in case they are too close.
+        scheduler.every('insert_queue', 1.0, lambda: self.insert_next(insert_queue))
+
+        # Snapshot the world every 100 simulation seconds
+        scheduler.every('snapshot', 100.0, snapshot)
+
+        # Kill off robots as soon as their battery runs out,
+        # this only looks at the robots that are due.
+        scheduler.every('death', 0, death)
+
+        # Attempt a reproduction every 3 simulation seconds
+        scheduler.every('reproduce', 3.0, reproduce)
+
+        # Log overall fitness every 2 simulation seconds
+        scheduler.every('log_fitness', 2.0, log_fitness)
+
+        # Write buffered log rows even if the chunk size is not reached
+        scheduler.every('flush_logs', conf.log_flush_interval, flush_logs)
+
+        # Print RTF to screen every so often
+        scheduler.every('rtf', rtf_interval, rtf)
+
+        if self.offspring:
+            self.offspring.start()
+
+        while True:
+            # The timeout makes sure the stop conditions are
+            # checked even if no world updates come in.
+            yield From(scheduler.run_due(timeout=0.1))
+            if insert_queue:
+                continue
 
             # Stop conditions
             num_bots = len(self.robots)
@@ -655,7 +807,9 @@ class OnlineEvoManager(World):
                 run_result = 'stable'
                 break
 
-            yield From(trollius.sleep(sleep_time))
+        scheduler.clear()
+        if self.offspring:
+            self.offspring.stop()
 
         # Delete all robots and reset the world, just in case a new run
         # will be started.
@@ -665,6 +819,19 @@ class OnlineEvoManager(World):
         yield From(wait_for(self.pause(True)))
         yield From(trollius.sleep(0.5))
 
+    @trollius.coroutine
+    def insert_next(self, insert_queue):
+        """
+        Gives birth to the next robot in the insert queue, if any.
+        :param insert_queue: List of (tree, bbox, parents) tuples
+        :return:
+        """
+        if insert_queue:
+            tree, bbox, parents = insert_queue.pop()
+            res = yield From(self.birth(tree, bbox, parents))
+            if res:
+                yield From(res)
+
     def write_result(self, result):
         """
         Writes the textual result status of a single run
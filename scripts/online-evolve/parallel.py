@@ -0,0 +1,113 @@
+"""
+Runs the repetitions of an online evolution experiment concurrently.
+Every repetition gets its own simulator / analyzer pair on distinct
+ports and its own output directory, at most `--parallel-instances`
+repetitions run at the same time. The results of all repetitions are
+merged into a single `results.csv` when they have finished.
+"""
+from __future__ import print_function
+
+import csv
+import glob
+import os
+import sys
+import time
+import subprocess
+import Queue
+from multiprocessing.pool import ThreadPool
+
+from start import here, parser
+from tol.config import instance_address
+
+
+def run_repetition(command, args, slots, directory):
+    """
+    Runs a single repetition in the given output directory on
+    the first available simulator / analyzer pair.
+    :param command: Command that runs a single repetition, the output
+                    directory and addresses are appended to it
+    :param args:
+    :param slots: Queue of available pair indices
+    :param directory:
+    :return: Exit code of the command
+    """
+    slot = slots.get()
+    try:
+        world_address = instance_address(args.world_address, slot)
+        print("Starting repetition in `%s` on %s." % (directory, world_address))
+        return subprocess.call(command + [
+            '--output-directory', directory,
+            '--num-repetitions', '1',
+            '--world-address', world_address,
+            '--analyzer-address', instance_address(args.analyzer_address, slot)
+        ], cwd=here)
+    finally:
+        slots.put(slot)
+
+
+def run_repetitions(command, args, directories):
+    """
+    Runs a repetition in each of the given directories, at most
+    `--parallel-instances` at the same time.
+    :param command: See `run_repetition`
+    :param args:
+    :param directories:
+    :return: List of exit codes
+    """
+    instances = max(1, args.parallel_instances)
+    slots = Queue.Queue()
+    for i in range(instances):
+        slots.put(i)
+
+    pool = ThreadPool(instances)
+
+    # `map_async` with a timeout keeps the main thread interruptible
+    codes = pool.map_async(lambda d: run_repetition(command, args, slots, d), directories).get(sys.maxint)
+    pool.close()
+    return codes
+
+
+def merge_results(directories, filename):
+    """
+    Merges the results of the given repetition directories, numbering
+    the runs by repetition.
+    :param directories:
+    :param filename:
+    :return:
+    """
+    with open(filename, 'wb') as f:
+        writer = csv.writer(f, delimiter=',')
+        writer.writerow(['run', 'result'])
+
+        for run, directory in enumerate(directories):
+            results = glob.glob(os.path.join(directory, '*', 'results.csv'))
+            if not results:
+                print("WARNING: No results for `%s`." % directory, file=sys.stderr)
+                continue
+
+            with open(results[0], 'rb') as rf:
+                reader = csv.reader(rf, delimiter=',')
+
+                # Skip header
+                next(reader)
+                for row in reader:
+                    writer.writerow([run, row[1]])
+
+
+def main():
+    args = parser.parse_args()
+    experiment = os.path.join(os.path.abspath(args.output_directory),
+                              time.strftime("%Y%m%d%H%M%S"))
+
+    directories = [os.path.join(experiment, "repetition-%d" % i)
+                   for i in range(args.num_repetitions)]
+    for directory in directories:
+        os.makedirs(directory)
+
+    run_repetitions([sys.executable, "start.py"] + sys.argv[1:], args, directories)
+    merge_results(directories, os.path.join(experiment, 'results.csv'))
+    print("Merged results written to `%s`." % experiment)
+
+
+if __name__ == '__main__':
+    main()
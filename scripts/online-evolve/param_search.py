@@ -1,11 +1,23 @@
+"""
+Parameter sweep for online evolution. Experiments are scheduled onto
+`--parallel-instances` simulator / analyzer pairs, each pair follows
+its own chain of parameter sets, which is adjusted after every
+completed experiment depending on its outcome. The sweep state is kept
+in `param_search.json` in the output directory, so an interrupted
+sweep can be resumed by running the same command again.
+"""
 from __future__ import print_function
 
 import random
 import sys
 import os
 import csv
-from start import OnlineEvolutionSupervisor, manager_cmd, analyzer_cmd, \
-    world_file, parser
+import json
+import subprocess
+import threading
+import Queue
+from start import here, parser
+from tol.config import instance_address
 
 # Parameter options to try, from left to right they should lead to
 # more lenient parameters (i.e. bigger chance for populations to survive)
@@ -27,67 +39,61 @@ param_options = {
 # Just to have a fixed manner of iteration
 keys = sorted([k for k in param_options])
 
-# Current key to browse through
-idx = 0
-
 # Maximum number of experiments to run
 max_experiments = 50
 
-# Get arguments to find the output directory
-args = parser.parse_args()
-
-# Parameter lists that have been tried
-tries = set()
-
-# Generate currently tried parameter list based on output directory
-output_dir = os.path.abspath(args.output_directory)
-for xpdir in sorted(os.listdir(output_dir)):
-    settings = os.path.join(output_dir, xpdir, "settings.conf")
-    if os.path.exists(settings):
-        s_args = parser.parse_args(["@"+settings])
 
-        gtry = []
-        for opt in keys:
-            opt_key = opt.replace('--', '').replace('-', '_')
-            gtry.append(getattr(s_args, opt_key))
+def get_param_set(positions):
+    """
+    :param positions: Dictionary of option => index in `param_options`
+    :return:
+    """
+    return tuple(param_options[p][positions[p]] for p in keys)
 
-        tries.add(tuple(gtry))
 
-# Randomly initialize the starting parameter set to something
-# that hasn't been tried before.
-param_set = None
-while True:
-    positions = {a: random.choice(range(len(param_options[a]))) for a in param_options}
-    param_set = tuple(param_options[p][positions[p]] for p in keys)
+def random_positions(tries):
+    """
+    Randomly initializes a parameter set to something
+    that hasn't been tried before.
+    :param tries:
+    :return:
+    """
+    while True:
+        positions = {a: random.choice(range(len(param_options[a]))) for a in param_options}
+        if get_param_set(positions) not in tries:
+            return positions
 
-    if param_set not in tries:
-        break
 
-for i in range(max_experiments):
-    # Launch a supervisor with the current parameter set
-    tries.add(param_set)
+def read_tries(output_dir):
+    """
+    Generates the set of tried parameter lists based on the output directory.
+    :param output_dir:
+    :return:
+    """
+    tries = set()
+    for xpdir in sorted(os.listdir(output_dir)):
+        settings = os.path.join(output_dir, xpdir, "settings.conf")
+        if os.path.exists(settings):
+            s_args = parser.parse_args(["@"+settings])
 
-    manager_args = sys.argv[1:]
-    for key, pos in positions.iteritems():
-        ops = param_options[key]
-        manager_args += [key, str(ops[pos])]
+            gtry = []
+            for opt in keys:
+                opt_key = opt.replace('--', '').replace('-', '_')
+                gtry.append(getattr(s_args, opt_key))
 
-    supervisor = OnlineEvolutionSupervisor(
-        manager_cmd=manager_cmd,
-        analyzer_cmd=analyzer_cmd,
-        world_file=world_file,
-        output_directory=args.output_directory,
-        manager_args=manager_args
-    )
+            tries.add(tuple(gtry))
 
-    supervisor.launch()
+    return tries
 
-    # Read run results file to decide what to do next
-    results_file = os.path.join(supervisor.snapshot_directory, 'results.csv')
 
+def read_result(results_file):
+    """
+    Reads run results file to decide what to do next.
+    :param results_file:
+    :return: Positive for extinction, negative for explosion, None without results
+    """
     if not os.path.exists(results_file):
-        print("Experiment finished without result - usually a quit, shutting down.")
-        break
+        return None
 
     result = 0
     with open(results_file, 'rb') as csvfile:
@@ -104,6 +110,21 @@ for i in range(max_experiments):
                 print("WARNING: Unsupported result `%s`" % row[1],
                       file=sys.stderr)
 
+    return result
+
+
+def adapt_positions(positions, idx, result, tries):
+    """
+    Changes a single parameter of the given set based on the result
+    of an experiment with it.
+    :param positions:
+    :param idx: Current key to browse through
+    :param result:
+    :param tries:
+    :return: New positions and key index
+    """
+    positions = dict(positions)
+
     # If we have an extinct population we would like to boost it, if not
     # we'll try to decrease an option instead.
     if result == 0:
@@ -140,8 +161,7 @@ for i in range(max_experiments):
                 cur, param_options[cur][positions[cur]], param_options[cur][new_pos]
             ))
             positions[cur] = new_pos
-            param_set = tuple(param_options[p][positions[p]] for p in keys)
-            if param_set in tries:
+            if get_param_set(positions) in tries:
                 print("Duplicate parameter set, restoring.")
                 positions[cur] = old_pos
             else:
@@ -150,4 +170,128 @@ for i in range(max_experiments):
         # Register another attempt
         attempts += 1
 
-    print("Experiment %d completed." % i)
+    return positions, idx
+
+
+def save_state(state_file, state):
+    """
+    Atomically writes the sweep state.
+    :param state_file:
+    :param state:
+    :return:
+    """
+    with open(state_file + '.tmp', 'wb') as f:
+        json.dump(state, f, indent=2)
+
+    os.rename(state_file + '.tmp', state_file)
+
+
+def run_experiment(args, slot, entry, done):
+    """
+    Runs a single experiment on the given simulator / analyzer pair. The
+    experiment name is used as the restore directory, so an interrupted
+    experiment continues from its last snapshot.
+    :param args:
+    :param slot:
+    :param entry:
+    :param done: Queue the finished (slot, entry, exit code) is put on
+    :return:
+    """
+    manager_args = sys.argv[1:]
+    for key, pos in entry['positions'].iteritems():
+        ops = param_options[key]
+        manager_args += [key, str(ops[pos])]
+
+    manager_args += [
+        '--restore-directory', entry['name'],
+        '--world-address', instance_address(args.world_address, slot),
+        '--analyzer-address', instance_address(args.analyzer_address, slot)
+    ]
+
+    code = None
+    try:
+        code = subprocess.call([sys.executable, "start.py"] + manager_args, cwd=here)
+    finally:
+        done.put((slot, entry, code))
+
+
+def main():
+    # Get arguments to find the output directory
+    args = parser.parse_args()
+    output_dir = os.path.abspath(args.output_directory)
+    state_file = os.path.join(output_dir, 'param_search.json')
+
+    # Parameter lists that have been tried
+    tries = read_tries(output_dir)
+
+    if os.path.exists(state_file):
+        with open(state_file, 'rb') as f:
+            state = json.load(f)
+        print("Resuming parameter sweep with %d queued experiments." % len(state['queue']))
+    else:
+        state = {'launched': 0, 'queue': []}
+
+    for entry in state['queue']:
+        tries.add(get_param_set(entry['positions']))
+
+    def enqueue(positions, idx):
+        tries.add(get_param_set(positions))
+        state['queue'].append({
+            'name': "experiment-%d" % state['launched'],
+            'positions': positions,
+            'idx': idx
+        })
+        state['launched'] += 1
+
+    # Start a new chain for every pair without queued experiment
+    instances = max(1, args.parallel_instances)
+    while len(state['queue']) < instances and state['launched'] < max_experiments:
+        enqueue(random_positions(tries), 0)
+
+    save_state(state_file, state)
+
+    done = Queue.Queue()
+    waiting = list(state['queue'])
+    free = range(instances)
+    running = [0]
+
+    def launch():
+        while waiting and free:
+            thread = threading.Thread(target=run_experiment,
+                                      args=(args, free.pop(0), waiting.pop(0), done))
+            thread.daemon = True
+            thread.start()
+            running[0] += 1
+
+    launch()
+    stopping = False
+    while running[0]:
+        # A timeout keeps the main thread interruptible
+        slot, entry, code = done.get(timeout=sys.maxint)
+        running[0] -= 1
+        free.append(slot)
+
+        result = read_result(os.path.join(output_dir, entry['name'], 'results.csv'))
+        if result is None:
+            # The experiment stays queued, so it is resumed with the sweep
+            print("Experiment `%s` finished without result - usually a quit, "
+                  "shutting down." % entry['name'])
+            stopping = True
+            continue
+
+        state['queue'].remove(entry)
+        print("Experiment `%s` completed." % entry['name'])
+
+        if not stopping:
+            if state['launched'] < max_experiments:
+                positions, idx = adapt_positions(entry['positions'], entry['idx'], result, tries)
+                enqueue(positions, idx)
+                waiting.append(state['queue'][-1])
+
+            launch()
+
+        save_state(state_file, state)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ rv_path = os.path.abspath(os.path.join(tol_path, '..', 'revolve'))
 sys.path.append(tol_path)
 
 from revolve.util import Supervisor
+from tol.config import str_to_address
 from online_evolve import parser
 
 os.environ['GAZEBO_PLUGIN_PATH'] = os.path.join(tol_path, 'build')
@@ -40,11 +41,38 @@ manager_cmd = [sys.executable, "online_evolve.py"]
 analyzer_cmd = os.path.join(rv_path, 'tools', 'analyzer', 'run-analyzer')
 world_file = os.path.join(here, 'online-evolve.world')
 
+
+def master_uri(address):
+    """
+    :param address: Host:port string
+    :return: Gazebo master URI for the given address
+    """
+    return "http://%s:%d" % str_to_address(address)
+
+
+def instance_analyzer_cmd(args):
+    """
+    Returns the analyzer command for the given arguments. Gazebo
+    servers pick their port from `GAZEBO_MASTER_URI`, so an analyzer
+    on a non-default port is started with that variable set.
+    :param args:
+    :return:
+    """
+    if not args.analyzer_address or \
+            args.analyzer_address == parser.get_default('analyzer_address'):
+        return analyzer_cmd
+
+    return ['env', 'GAZEBO_MASTER_URI=' + master_uri(args.analyzer_address), analyzer_cmd]
+
+
 if __name__ == '__main__':
     args = parser.parse_args()
+    if args.world_address != parser.get_default('world_address'):
+        os.environ['GAZEBO_MASTER_URI'] = master_uri(args.world_address)
+
     supervisor = OnlineEvolutionSupervisor(
         manager_cmd=manager_cmd,
-        analyzer_cmd=analyzer_cmd,
+        analyzer_cmd=instance_analyzer_cmd(args),
         world_file=world_file,
         output_directory=args.output_directory,
         manager_args=sys.argv[1:],
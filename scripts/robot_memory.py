@@ -0,0 +1,182 @@
+"""
+Memory benchmark for the robot manager. Creates the same population of
+robots with the current `Robot` class and with the `Robot` class of an
+earlier revision of this repository (by default the first commit), feeds
+both the same pose updates and matings through their own code, and
+reports the memory footprint per robot of each.
+
+The footprint counts every object reachable from a robot, except for
+objects that are shared or accounted for elsewhere: the configuration,
+the tree, the protobuf robot, the parents and the other robots.
+"""
+from __future__ import print_function
+import os
+import sys
+import imp
+import random
+import subprocess
+
+# Add "tol" directory to Python path
+root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(root)
+
+from sdfbuilder.math import Vector3
+from revolve.util import Time
+
+from tol.config import parser
+from tol.spec import get_tree_generator
+from tol.manage.robot import Robot
+from tol.manage.spatial import SpatialGrid
+from tol.manage.population import PopulationState
+
+parser.add_argument("--num-robots", default=100, type=int,
+                    help="Number of robots to create.")
+parser.add_argument("--num-mates", default=10, type=int,
+                    help="Number of different robots each robot has mated with.")
+parser.add_argument("--baseline-revision", default=None, type=str,
+                    help="Git revision of the `Robot` class to compare with, "
+                         "defaults to the first commit.")
+
+
+class Message(object):
+    """
+    Stand-in for the fields of the robot state message that are
+    read by `update_state`.
+    """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def robot_state(x, y, z):
+    return Message(pose=Message(position=Message(x=x, y=y, z=z),
+                                orientation=Message(w=1.0, x=0.0, y=0.0, z=0.0)))
+
+
+class World(object):
+    """
+    The parts of the world manager that robots write to.
+    """
+
+    def __init__(self, conf):
+        self.spatial_index = SpatialGrid(conf.spatial_cell_size)
+        self.population_state = PopulationState()
+
+
+def load_robot_class(revision):
+    """
+    :param revision: Git revision
+    :return: The `Robot` class of `tol/manage/robot.py` at the given revision
+    """
+    if revision is None:
+        revision = subprocess.check_output(['git', 'rev-list', '--max-parents=0', 'HEAD'],
+                                           cwd=root).split()[0]
+
+    source = subprocess.check_output(['git', 'show', '%s:tol/manage/robot.py' % revision],
+                                     cwd=root)
+    module = imp.new_module('robot_%s' % revision)
+    exec compile(source, 'tol/manage/robot.py@%s' % revision, 'exec') in module.__dict__
+    return module.Robot
+
+
+def footprint(obj, shared):
+    """
+    Returns the total size of `obj` and all the objects it references,
+    not counting the objects in `shared` or anything they reference.
+    :param obj:
+    :param shared:
+    :return:
+    """
+    seen = set(id(o) for o in shared)
+    stack = [obj]
+    total = 0
+
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)) or hasattr(o, 'maxlen'):
+            stack.extend(o)
+        else:
+            if hasattr(o, '__dict__'):
+                stack.append(o.__dict__)
+
+            for cls in type(o).__mro__:
+                for attr in getattr(cls, '__slots__', ()):
+                    if hasattr(o, attr):
+                        stack.append(getattr(o, attr))
+
+    return total
+
+
+def create_population(cls, conf, trees, paths, mates):
+    """
+    :param cls: Robot class
+    :param conf:
+    :param trees:
+    :param paths: Positions of every robot at each pose update
+    :param mates: Indices of the robots each robot has mated with
+    :return: List of robots
+    """
+    world = World(conf)
+    dt = 1.0 / conf.pose_update_frequency
+    robots = []
+    for i, tree in enumerate(trees):
+        robots.append(cls(conf, "gen__%d" % i, tree, tree.to_robot(i), Vector3(*paths[i][0]),
+                          Time(dbl=0.0), battery_level=1000.0))
+
+    for i, robot in enumerate(robots):
+        for j, (x, y, z) in enumerate(paths[i]):
+            robot.update_state(world, Time(dbl=j * dt), robot_state(x, y, z), None)
+
+        for other in mates[i]:
+            robot.did_mate_with(robots[other])
+
+    return robots
+
+
+def per_robot(robots):
+    """
+    :param robots:
+    :return: Average footprint in bytes
+    """
+    total = 0
+    for robot in robots:
+        shared = [robot.conf, robot.tree, robot.robot, robot.parents] + \
+                 [other for other in robots if other is not robot]
+        total += footprint(robot, shared)
+
+    return total / float(len(robots))
+
+
+def main():
+    conf = parser.parse_args()
+    generator = get_tree_generator(conf)
+    n = conf.num_robots
+
+    # Enough pose updates to fill the speed window after the warmup time
+    updates = int((conf.warmup_time + conf.evaluation_time) * conf.pose_update_frequency) + 1
+    trees = [generator.generate_tree() for _ in xrange(n)]
+    paths = [[(random.random(), random.random(), 0.1) for _ in xrange(updates)] for _ in xrange(n)]
+    mates = [random.sample(range(n), min(conf.num_mates, n)) for _ in xrange(n)]
+
+    before = per_robot(create_population(load_robot_class(conf.baseline_revision), conf,
+                                         trees, paths, mates))
+    after = per_robot(create_population(Robot, conf, trees, paths, mates))
+
+    print("Robots: %d, pose updates per robot: %d, mates per robot: %d" % (
+        n, updates, conf.num_mates))
+    print("Bytes per robot before: %d" % before)
+    print("Bytes per robot after:  %d" % after)
+    print("Reduction: %.1f%%" % (100.0 * (before - after) / before))
+
+
+if __name__ == '__main__':
+    main()
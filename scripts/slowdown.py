@@ -4,7 +4,6 @@ import collections
 from sdfbuilder import Pose
 from sdfbuilder.math import Vector3
 from revolve.convert.yaml import yaml_to_robot
-from revolve.util import Time
 from revolve.angle import Tree
 import os
 import sys
@@ -27,13 +26,7 @@ random.seed(12345)
 
 @trollius.coroutine
 def sleep_sim_time(world, seconds):
-    start = world.last_time if world.last_time else Time()
-    remain = seconds
-
-    while remain > 0:
-        yield From(trollius.sleep(0.05))
-        now = world.last_time if world.last_time else Time()
-        remain = seconds - float(now - start)
+    yield From(world.sleep_sim(seconds))
 
 
 @trollius.coroutine
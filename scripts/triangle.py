@@ -5,7 +5,6 @@ import logging
 import argparse
 
 from revolve.build.util import in_cm, in_mm
-from revolve.util import Time
 
 from pygazebo.pygazebo import DisconnectError
 from trollius.py33_exceptions import ConnectionResetError, ConnectionRefusedError
@@ -48,26 +47,14 @@ insert_z = 1.5
 
 
 @trollius.coroutine
-def sleep_sim_time(world, seconds, state_break=[False]):
+def sleep_sim_time(world, seconds):
     """
-    Sleeps for a certain number of simulation seconds,
-    note that this is always approximate as it relies
-    on real world sleeping.
+    Sleeps for a certain number of simulation seconds.
     :param world:
     :param seconds:
-    :param state_break: List containing one boolean, the
-                        wait will be terminated if this
-                        is set to True (basically a hack
-                        to break out of automatic mode early).
     :return:
     """
-    start = world.last_time if world.last_time else Time()
-    remain = seconds
-
-    while remain > 0 and not state_break[0]:
-        yield From(trollius.sleep(0.1))
-        now = world.last_time if world.last_time else Time()
-        remain = seconds - float(now - start)
+    yield From(world.sleep_sim(seconds))
 
 
 
@@ -0,0 +1,50 @@
+"""
+Stand-in for the online evolution `start.py`, used to test `parallel.py`
+without a simulator. It claims the simulator address it is given for a
+short while, failing if another repetition holds the same address, and
+writes a `results.csv` naming the addresses it was started with.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--lock-directory', required=True)
+parser.add_argument('--duration', default=0.2, type=float)
+parser.add_argument('--output-directory')
+parser.add_argument('--world-address')
+parser.add_argument('--analyzer-address')
+parser.add_argument('--num-repetitions', type=int)
+
+
+def main():
+    args, _ = parser.parse_known_args()
+    if args.num_repetitions != 1:
+        return 3
+
+    lock = os.path.join(args.lock_directory, args.world_address.replace(':', '_'))
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL)
+    except OSError:
+        sys.stderr.write("Address `%s` is already in use.\n" % args.world_address)
+        return 2
+
+    try:
+        time.sleep(args.duration)
+        directory = os.path.join(args.output_directory, time.strftime("%Y%m%d%H%M%S"))
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'results.csv'), 'wb') as f:
+            writer = csv.writer(f, delimiter=',')
+            writer.writerow(['run', 'result'])
+            writer.writerow([0, '%s|%s' % (args.world_address, args.analyzer_address)])
+    finally:
+        os.close(fd)
+        os.remove(lock)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from tol.manage.cache import AnalyzerCache, FitnessCache, body_key
+
+
+class Param(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class Part(object):
+    def __init__(self, part_id, part_type, orientation=0, params=(), children=()):
+        self.id = part_id
+        self.type = part_type
+        self.orientation = orientation
+        self.param = [Param(v) for v in params]
+        self.child = list(children)
+
+
+class Connection(object):
+    def __init__(self, src_slot, dst_slot, part):
+        self.src_slot = src_slot
+        self.dst_slot = dst_slot
+        self.part = part
+
+
+class Body(object):
+    def __init__(self, root):
+        self.root = root
+
+
+def make_body(prefix, hinge_param=0.5, order=(0, 1)):
+    """
+    Core with two children, the part IDs start with the given prefix.
+    """
+    children = [Connection(0, 0, Part(prefix + 'brick', 'FixedBrick')),
+                Connection(1, 0, Part(prefix + 'hinge', 'ActiveHinge', params=(hinge_param,)))]
+    return Body(Part(prefix + 'core', 'Core', children=[children[i] for i in order]))
+
+
+class TestBodyKey(unittest.TestCase):
+    def test_ignores_part_ids(self):
+        self.assertEqual(body_key(make_body('a')), body_key(make_body('b')))
+
+    def test_ignores_child_order(self):
+        self.assertEqual(body_key(make_body('a', order=(0, 1))),
+                         body_key(make_body('a', order=(1, 0))))
+
+    def test_depends_on_parameters(self):
+        self.assertNotEqual(body_key(make_body('a', hinge_param=0.5)),
+                            body_key(make_body('a', hinge_param=0.6)))
+
+
+class TestAnalyzerCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hits_and_misses(self):
+        cache = AnalyzerCache(10)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+    def test_evicts_least_recently_used(self):
+        cache = AnalyzerCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+
+        # Using `a` makes `b` the least recently used entry
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_put_replaces(self):
+        cache = AnalyzerCache(2)
+        cache.put('a', 1)
+        cache.put('a', 2)
+        self.assertEqual(len(cache.entries), 1)
+        self.assertEqual(cache.get('a'), 2)
+
+    def test_save_and_load(self):
+        filename = os.path.join(self.directory, 'cache.pickle')
+        cache = AnalyzerCache(3, filename)
+        for i in range(5):
+            cache.put(i, i * i)
+
+        cache.save()
+
+        loaded = AnalyzerCache(3, filename)
+        self.assertEqual(list(loaded.entries.items()), [(2, 4), (3, 9), (4, 16)])
+
+        # A smaller cache keeps the most recently used entries
+        loaded = AnalyzerCache(2, filename)
+        self.assertEqual(list(loaded.entries.keys()), [3, 4])
+
+    def test_save_without_file(self):
+        cache = AnalyzerCache(3)
+        cache.put('a', 1)
+        cache.save()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class Evaluated(object):
+    def __init__(self, name, fitness):
+        self.name = name
+        self._fitness = fitness
+
+    def fitness(self):
+        return self._fitness
+
+
+class TestFitnessCache(unittest.TestCase):
+    def test_needs_evaluation(self):
+        cache = FitnessCache(2)
+        self.assertTrue(cache.needs_evaluation('a'))
+        self.assertTrue(cache.needs_evaluation('a', planned=1))
+        self.assertFalse(cache.needs_evaluation('a', planned=2))
+
+        cache.add('a', Evaluated('gen__1', 1.0))
+        self.assertTrue(cache.needs_evaluation('a'))
+        self.assertFalse(cache.needs_evaluation('a', planned=1))
+
+        cache.add('a', Evaluated('gen__2', 2.0))
+        self.assertFalse(cache.needs_evaluation('a'))
+        self.assertTrue(cache.needs_evaluation('b'))
+
+    def test_average_fitness(self):
+        cache = FitnessCache(3)
+        first, second = Evaluated('gen__1', 1.0), Evaluated('gen__2', 2.0)
+        cache.add('a', first)
+        cache.add('a', second)
+        cache.add('b', Evaluated('gen__3', 5.0))
+
+        self.assertEqual(cache.robots('a'), [first, second])
+        self.assertEqual(cache.fitness(first), 1.5)
+        self.assertEqual(cache.fitness(second), 1.5)
+
+        # Robots that are not in the cache keep their own fitness
+        self.assertEqual(cache.fitness(Evaluated('gen__4', 0.25)), 0.25)
+
+    def test_reuse(self):
+        cache = FitnessCache(1)
+        cache.add('a', Evaluated('gen__1', 1.0))
+        cache.misses += 1
+
+        reused = Evaluated('gen__2', 3.0)
+        cache.reuse('a', reused)
+        self.assertEqual(cache.fitness(reused), 1.0)
+        self.assertEqual(len(cache.robots('a')), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+    def test_clear(self):
+        cache = FitnessCache(1)
+        robot = Evaluated('gen__1', 1.0)
+        cache.add('a', robot)
+        cache.reuse('a', Evaluated('gen__2', 1.0))
+        cache.clear()
+
+        self.assertEqual(cache.robots('a'), [])
+        self.assertTrue(cache.needs_evaluation('a'))
+        self.assertEqual(cache.fitness(Evaluated('gen__1', 4.0)), 4.0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        self.assertEqual(cache.hit_rate(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
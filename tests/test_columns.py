@@ -0,0 +1,125 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from tol.logging import ColumnLog, LogWriter, read_columns, export_csv
+
+COLUMNS = [('id', 'l'), ('time', 'd'), ('value', 'd')]
+
+
+def read_csv(filename):
+    with open(filename, 'rb') as f:
+        return list(csv.reader(f, delimiter=','))
+
+
+def rows(start, stop):
+    return [(i, 0.5 * i, i * i / 4.0) for i in range(start, stop)]
+
+
+def csv_rows(values):
+    return [[str(v) for v in row] for row in values]
+
+
+class TestColumnLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.writer = LogWriter()
+
+    def tearDown(self):
+        self.writer.stop()
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open_log(self, binary=False, **kwargs):
+        return ColumnLog(self.path('log.bin' if binary else 'log.csv'), COLUMNS,
+                         self.writer, binary=binary, **kwargs)
+
+    def test_csv(self):
+        log = self.open_log()
+        for row in rows(0, 5):
+            log.append(row)
+
+        log.close()
+        self.assertEqual(read_csv(log.filename), [['id', 'time', 'value']] + csv_rows(rows(0, 5)))
+
+    def test_chunks(self):
+        log = self.open_log(chunk_size=3)
+        for row in rows(0, 4):
+            log.append(row)
+
+        # Only the full chunk has been handed to the writer
+        self.writer.sync()
+        self.assertEqual(read_csv(log.filename)[1:], csv_rows(rows(0, 3)))
+        self.assertEqual(log.rows, 1)
+
+        log.sync()
+        self.assertEqual(read_csv(log.filename)[1:], csv_rows(rows(0, 4)))
+        log.close()
+
+    def test_offset_and_truncate(self):
+        for binary in (False, True):
+            log = self.open_log(binary=binary, chunk_size=4)
+            for row in rows(0, 6):
+                log.append(row)
+
+            offset = log.offset()
+            self.assertEqual(offset, os.path.getsize(log.filename))
+
+            # Rows written or buffered after the offset are discarded
+            for row in rows(6, 15):
+                log.append(row)
+
+            log.truncate(offset)
+            log.close()
+            self.assertEqual(os.path.getsize(log.filename), offset)
+
+            # Reopened as on restore, without a second header
+            log = self.open_log(binary=binary, append=True)
+            for row in rows(20, 22):
+                log.append(row)
+
+            log.close()
+
+            expected = rows(0, 6) + rows(20, 22)
+            if binary:
+                columns, data = read_columns(log.filename)
+                self.assertEqual(zip(*data), expected)
+            else:
+                self.assertEqual(read_csv(log.filename),
+                                 [['id', 'time', 'value']] + csv_rows(expected))
+
+    def test_binary(self):
+        log = self.open_log(binary=True, chunk_size=3)
+        for row in rows(0, 10):
+            log.append(row)
+
+        log.close()
+
+        columns, data = read_columns(log.filename)
+        self.assertEqual(columns, COLUMNS)
+        self.assertEqual([column.typecode for column in data], ['l', 'd', 'd'])
+        self.assertEqual(zip(*data), rows(0, 10))
+
+        export_csv(log.filename, self.path('export.csv'))
+        self.assertEqual(read_csv(self.path('export.csv')),
+                         [['id', 'time', 'value']] + csv_rows(rows(0, 10)))
+
+    def test_empty_binary(self):
+        log = self.open_log(binary=True)
+        log.close()
+        columns, data = read_columns(log.filename)
+        self.assertEqual(columns, COLUMNS)
+        self.assertEqual([len(column) for column in data], [0, 0, 0])
+
+    def test_read_csv_as_binary(self):
+        log = self.open_log()
+        log.close()
+        self.assertRaises(ValueError, read_columns, log.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
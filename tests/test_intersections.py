@@ -0,0 +1,144 @@
+import math
+import random
+import unittest
+
+from tol.build.intersection import count_intersections, _boxes_intersect
+
+
+def link(name, pose=None, boxes=(), spheres=0):
+    """
+    :param name:
+    :param pose: Pose string of the link
+    :param boxes: List of (size, pose) tuples of box collisions
+    :param spheres: Number of sphere collisions
+    :return: Link SDF
+    """
+    xml = '<link name="%s">' % name
+    if pose:
+        xml += '<pose>%s</pose>' % pose
+
+    for i, (size, box_pose) in enumerate(boxes):
+        xml += '<collision name="%s_box%d">' % (name, i)
+        if box_pose:
+            xml += '<pose>%s</pose>' % box_pose
+
+        xml += '<geometry><box><size>%s</size></box></geometry></collision>' % size
+
+    for i in range(spheres):
+        xml += ('<collision name="%s_sphere%d"><geometry><sphere><radius>1</radius>'
+                '</sphere></geometry></collision>' % (name, i))
+
+    return xml + '</link>'
+
+
+def joint(parent, child):
+    return ('<joint name="%s_%s" type="revolute"><parent>%s</parent><child>%s</child>'
+            '</joint>' % (parent, child, parent, child))
+
+
+def model(*elements):
+    return '<sdf version="1.5"><model name="robot">%s</model></sdf>' % ''.join(elements)
+
+
+class TestCountIntersections(unittest.TestCase):
+    def test_overlapping_links(self):
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='0.5 0 0 0 0 0', boxes=[('1 1 1', None)]))
+        self.assertEqual(count_intersections(sdf), 1)
+
+    def test_separated_links(self):
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='1.5 0 0 0 0 0', boxes=[('1 1 1', None)]))
+        self.assertEqual(count_intersections(sdf), 0)
+
+    def test_collision_pose(self):
+        # The collision pose is relative to the link
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='1.5 0 0 0 0 0', boxes=[('1 1 1', '-1 0 0 0 0 0')]))
+        self.assertEqual(count_intersections(sdf), 1)
+
+    def test_joined_links_are_ignored(self):
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='0.5 0 0 0 0 0', boxes=[('1 1 1', None)]),
+                    joint('a', 'b'))
+        self.assertEqual(count_intersections(sdf), 0)
+
+    def test_same_link_is_ignored(self):
+        sdf = model(link('a', boxes=[('1 1 1', None), ('1 1 1', '0.5 0 0 0 0 0')]))
+        self.assertEqual(count_intersections(sdf), 0)
+
+    def test_other_geometries_are_ignored(self):
+        sdf = model(link('a', spheres=1), link('b', spheres=1))
+        self.assertEqual(count_intersections(sdf), 0)
+
+    def test_margin(self):
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='0.9 0 0 0 0 0', boxes=[('1 1 1', None)]))
+        self.assertEqual(count_intersections(sdf), 1)
+        self.assertEqual(count_intersections(sdf, margin=0.1), 0)
+
+    def test_rotated_box(self):
+        # The axis aligned bounding boxes of these overlap, the boxes don't
+        yaw = '0 0 %f' % (0.25 * math.pi)
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='1.15 1.15 0 ' + yaw, boxes=[('1 1 1', None)]))
+        self.assertEqual(count_intersections(sdf), 0)
+
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='1.15 0 0 ' + yaw, boxes=[('1 1 1', None)]))
+        self.assertEqual(count_intersections(sdf), 1)
+
+    def test_counts_pairs(self):
+        sdf = model(link('a', boxes=[('1 1 1', None)]),
+                    link('b', pose='0.5 0 0 0 0 0', boxes=[('1 1 1', None)]),
+                    link('c', pose='1.2 0 0 0 0 0', boxes=[('1 1 1', None)]))
+        self.assertEqual(count_intersections(sdf), 2)
+
+
+def rotation(roll, pitch, yaw):
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return ((cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr),
+            (sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr),
+            (-sp, cp * sr, cp * cr))
+
+
+def contains(box, point):
+    rot, pos, half = box
+    d = [point[i] - pos[i] for i in range(3)]
+    return all(abs(sum(rot[k][i] * d[k] for k in range(3))) <= half[i] for i in range(3))
+
+
+class TestBoxesIntersect(unittest.TestCase):
+    def test_random_boxes(self):
+        """
+        Boxes that share a sampled point must be reported as intersecting,
+        boxes with bounding spheres that don't touch must not.
+        """
+        rng = random.Random(1234)
+        for _ in range(300):
+            boxes = []
+            for _ in range(2):
+                rot = rotation(*[rng.uniform(-math.pi, math.pi) for _ in range(3)])
+                pos = tuple(rng.uniform(-1, 1) for _ in range(3))
+                half = [rng.uniform(0.1, 0.8) for _ in range(3)]
+                boxes.append((rot, pos, half))
+
+            a, b = boxes
+            result = _boxes_intersect(a, b)
+            self.assertEqual(result, _boxes_intersect(b, a))
+
+            dist = math.sqrt(sum((a[1][i] - b[1][i]) ** 2 for i in range(3)))
+            radius = lambda box: math.sqrt(sum(h * h for h in box[2]))
+            if dist > radius(a) + radius(b):
+                self.assertFalse(result)
+
+            if not result:
+                for _ in range(200):
+                    point = tuple(rng.uniform(-2, 2) for _ in range(3))
+                    self.assertFalse(contains(a, point) and contains(b, point))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import itertools
+import random
+import unittest
+from argparse import Namespace
+
+from sdfbuilder.math import Vector3
+
+from tol.manage.robot import Robot
+from tol.manage.mating import MateIndex
+
+
+class FakeRobot(object):
+    """
+    Robot with fixed fitness and readiness, which uses the mating
+    decision of `Robot`.
+    """
+    will_mate_with = Robot.will_mate_with.im_func
+    distance_to = Robot.distance_to.im_func
+
+    def __init__(self, conf, robot_id, x, y, fitness, ready=True):
+        self.conf = conf
+        self.name = 'gen__%d' % robot_id
+        self.robot = Namespace(id=robot_id)
+        self.last_position = Vector3(x, y, 0.1)
+        self.mated_with = {}
+        self._fitness = fitness
+        self._ready = ready
+
+    def fitness(self):
+        return self._fitness
+
+    def mating_ready(self):
+        return self._ready
+
+
+def pairwise_mates(robots):
+    """
+    Mate selection by checking every pair of robots.
+    """
+    return [(ra, rb) for ra, rb in itertools.combinations(robots, 2)
+            if ra.will_mate_with(rb) and rb.will_mate_with(ra)]
+
+
+class TestMateIndex(unittest.TestCase):
+    def make_robots(self, rng, conf, n, size):
+        robots = []
+        for i in range(n):
+            fitness = 0.0 if rng.random() < 0.1 else rng.uniform(0.01, 2)
+            robot = FakeRobot(conf, 1000 - i, rng.uniform(-size, size), rng.uniform(-size, size),
+                              fitness, ready=rng.random() < 0.9)
+            robots.append(robot)
+
+        # Some pairs have reached the maximum number of children
+        for ra, rb in itertools.combinations(robots, 2):
+            if rng.random() < 0.05:
+                ra.mated_with[rb.robot.id] = conf.max_pair_children + 1
+
+        return robots
+
+    def test_equivalent_to_pairwise(self):
+        rng = random.Random(3)
+        for distance, ratio in ((2.0, 0.5), (1.0, 0.9), (5.0, 0.0), (0.5, 1.0)):
+            conf = Namespace(mating_distance_threshold=distance, mating_fitness_threshold=ratio,
+                             max_pair_children=2)
+            for size in (3, 10):
+                robots = self.make_robots(rng, conf, 120, size)
+                index = MateIndex(robots, conf)
+
+                expected = pairwise_mates(robots)
+                self.assertEqual([(a.name, b.name) for a, b in index.pairs()],
+                                 [(a.name, b.name) for a, b in expected])
+
+                for ra in robots:
+                    mates = [rb for rb in robots if rb is not ra and
+                             ra.will_mate_with(rb) and rb.will_mate_with(ra)]
+                    self.assertEqual(index.mates(ra), mates)
+
+    def test_cell_boundaries(self):
+        conf = Namespace(mating_distance_threshold=1.0, mating_fitness_threshold=0.5,
+                         max_pair_children=2)
+
+        # Pairs just within the distance threshold across cell boundaries
+        robots = [FakeRobot(conf, 1, -0.45, 0, 1.0), FakeRobot(conf, 2, 0.45, 0, 1.0),
+                  FakeRobot(conf, 3, 1.4, 1.0, 1.0), FakeRobot(conf, 4, -1.95, -0.95, 1.0)]
+        index = MateIndex(robots, conf)
+        self.assertEqual(index.pairs(), pairwise_mates(robots))
+        self.assertTrue(index.pairs())
+
+    def test_fitness_threshold_edge(self):
+        conf = Namespace(mating_distance_threshold=1.0, mating_fitness_threshold=0.5,
+                         max_pair_children=2)
+
+        # A fitness ratio of exactly the threshold is allowed, the third
+        # robot is only within the mating distance of the first and its
+        # fitness is just below the threshold.
+        robots = [FakeRobot(conf, 1, 0, 0, 1.0), FakeRobot(conf, 2, 0.1, 0, 0.5),
+                  FakeRobot(conf, 3, -0.95, 0, 0.4999)]
+        index = MateIndex(robots, conf)
+        self.assertEqual(index.pairs(), pairwise_mates(robots))
+        self.assertEqual([(a.name, b.name) for a, b in index.pairs()], [('gen__1', 'gen__2')])
+
+    def test_not_ready(self):
+        conf = Namespace(mating_distance_threshold=1.0, mating_fitness_threshold=0.0,
+                         max_pair_children=2)
+        robots = [FakeRobot(conf, 1, 0, 0, 1.0, ready=False), FakeRobot(conf, 2, 0, 0, 1.0)]
+        index = MateIndex(robots, conf)
+        self.assertEqual(index.pairs(), [])
+        self.assertEqual(index.mates(robots[0]), [])
+        self.assertEqual(index.mates(robots[1]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
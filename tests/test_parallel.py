@@ -0,0 +1,76 @@
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here, '..', 'scripts', 'online-evolve'))
+
+from tol.config import instance_address
+from parallel import parser, run_repetitions, merge_results
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Runs `parallel.py` repetitions with a stand-in for the simulator
+    and evolution process, see `standin_start.py`.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.locks = os.path.join(self.directory, 'locks')
+        os.mkdir(self.locks)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_experiment(self, repetitions, instances):
+        args = parser.parse_args(['--parallel-instances', str(instances)])
+        directories = [os.path.join(self.directory, 'repetition-%d' % i) for i in range(repetitions)]
+        for directory in directories:
+            os.makedirs(directory)
+
+        command = [sys.executable, os.path.join(here, 'standin_start.py'),
+                   '--lock-directory', self.locks]
+        codes = run_repetitions(command, args, directories)
+
+        filename = os.path.join(self.directory, 'results.csv')
+        merge_results(directories, filename)
+        with open(filename, 'rb') as f:
+            rows = list(csv.reader(f, delimiter=','))
+
+        return args, codes, rows
+
+    def test_repetitions_use_separate_instances(self):
+        args, codes, rows = self.run_experiment(6, 3)
+
+        # A nonzero code means two repetitions shared a simulator
+        self.assertEqual(codes, [0] * 6)
+        self.assertEqual(rows[0], ['run', 'result'])
+        self.assertEqual([row[0] for row in rows[1:]], [str(i) for i in range(6)])
+
+        pairs = set('%s|%s' % (instance_address(args.world_address, i),
+                               instance_address(args.analyzer_address, i)) for i in range(3))
+        used = set(row[1] for row in rows[1:])
+        self.assertTrue(used <= pairs)
+        self.assertEqual(os.listdir(self.locks), [])
+
+    def test_single_instance(self):
+        args, codes, rows = self.run_experiment(2, 1)
+        self.assertEqual(codes, [0, 0])
+        self.assertEqual([row[1] for row in rows[1:]],
+                         ['%s|%s' % (args.world_address, args.analyzer_address)] * 2)
+
+    def test_missing_results(self):
+        directory = os.path.join(self.directory, 'empty')
+        os.mkdir(directory)
+        filename = os.path.join(self.directory, 'results.csv')
+        merge_results([directory], filename)
+        with open(filename, 'rb') as f:
+            self.assertEqual(list(csv.reader(f, delimiter=',')), [['run', 'result']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import random
+import unittest
+
+from tol.manage.population import PopulationState
+
+
+class FakeRobot(object):
+    """
+    Robot with the attributes `PopulationState` reads.
+    """
+
+    def __init__(self, name, rng):
+        self.name = name
+        self.size = rng.randint(1, 20)
+        self.fitness_calls = 0
+        self.move(rng)
+
+    def move(self, rng):
+        self._fitness = 0.0 if rng.random() < 0.2 else rng.uniform(0, 3)
+
+    def fitness(self):
+        self.fitness_calls += 1
+        return self._fitness
+
+
+class TestPopulationState(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.state = PopulationState(capacity=4)
+        self.robots = {}
+
+    def add(self, n):
+        for _ in range(n):
+            robot = FakeRobot('gen__%d' % self.rng.randint(0, 10 ** 9), self.rng)
+            self.robots[robot.name] = robot
+            self.state.update(robot)
+
+    def assertMatchesRobots(self):
+        state = self.state
+        self.assertEqual(len(state), len(self.robots))
+        self.assertEqual(sorted(state.names), sorted(self.robots))
+
+        sizes, fitness = state.column('size'), state.column('fitness')
+        for name, robot in self.robots.items():
+            row = state.rows[name]
+            self.assertEqual(state.names[row], name)
+            self.assertIs(state.robots[row], robot)
+            self.assertAlmostEqual(sizes[row], robot.size)
+            self.assertAlmostEqual(fitness[row], robot.fitness())
+
+        self.assertAlmostEqual(state.total('size'), sum(r.size for r in self.robots.values()))
+        self.assertAlmostEqual(state.total('fitness'), sum(r.fitness() for r in self.robots.values()))
+
+        totals = state.compute_totals()
+        for col in state.TOTALS:
+            self.assertAlmostEqual(state.total(col), totals[col])
+
+    def test_add_grows_table(self):
+        self.add(50)
+        self.assertGreaterEqual(self.state.capacity, 50)
+        self.assertMatchesRobots()
+
+    def test_updates_and_removes(self):
+        self.add(30)
+        for _ in range(20):
+            for robot in self.rng.sample(self.robots.values(), 10):
+                robot.move(self.rng)
+                self.state.update(robot)
+
+            for name in self.rng.sample(sorted(self.robots), 3):
+                del self.robots[name]
+                self.state.remove(name)
+
+            self.add(3)
+            self.assertMatchesRobots()
+
+    def test_remove_last_and_missing(self):
+        self.add(5)
+        last = self.state.names[-1]
+        del self.robots[last]
+        self.state.remove(last)
+        self.state.remove('missing')
+        self.assertMatchesRobots()
+
+    def test_column_copy(self):
+        self.add(5)
+        column = self.state.column('fitness')
+        self.assertEqual(len(column), 5)
+        column[0] = -1.0
+        self.assertNotEqual(self.state.columns['fitness'][0], -1.0)
+
+    def test_clear(self):
+        self.add(10)
+        self.state.clear()
+        self.robots.clear()
+        self.assertMatchesRobots()
+
+        self.add(3)
+        self.assertMatchesRobots()
+
+    def test_fitness_is_lazy(self):
+        self.add(10)
+        robots = self.robots.values()
+        for _ in range(3):
+            for robot in robots:
+                robot.move(self.rng)
+                self.state.update(robot)
+
+        # Pose updates don't compute the fitness, reading the
+        # total does so once for every updated robot.
+        self.assertEqual([r.fitness_calls for r in robots], [0] * 10)
+        self.state.total('fitness')
+        self.state.total('fitness')
+        self.assertEqual([r.fitness_calls for r in robots], [1] * 10)
+
+        robots[0].move(self.rng)
+        self.state.update(robots[0])
+        self.state.total('size')
+        self.assertEqual(sum(r.fitness_calls for r in robots), 11)
+
+    def test_resync(self):
+        self.state.RESYNC_INTERVAL = 7
+        self.add(10)
+        for _ in range(100):
+            robot = self.rng.choice(self.robots.values())
+            robot.move(self.rng)
+            self.state.update(robot)
+            self.state.total('fitness')
+
+        self.assertMatchesRobots()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import math
+import random
+import unittest
+from argparse import Namespace
+
+from sdfbuilder.math import Vector3
+
+from tol.manage.robot import Robot
+
+
+class WindowRobot(object):
+    """
+    Robot with the speed window of `Robot`, which is fed pose
+    updates in the same way as `Robot.update_state` does.
+    """
+    _init_window = Robot._init_window.im_func
+    _add_sample = Robot._add_sample.im_func
+    _cached = Robot._cached.im_func
+    velocity = Robot.velocity.im_func
+    _velocity = Robot._velocity.im_func
+    displacement = Robot.displacement.im_func
+    _displacement = Robot._displacement.im_func
+    displacement_velocity = Robot.displacement_velocity.im_func
+    _displacement_velocity = Robot._displacement_velocity.im_func
+    fitness = Robot.fitness.im_func
+    _fitness = Robot._fitness.im_func
+    fitness_bound = Robot.fitness_bound.im_func
+    _spread = Robot._spread.im_func
+
+    def __init__(self, conf, x=0.0, y=0.0):
+        self.conf = conf
+        self.warmup_time = conf.warmup_time
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.last_position = Vector3(x, y, 0.1)
+        self.last_update = 0.0
+
+        # All pose updates after the warmup time
+        self.samples = []
+        self._init_window()
+
+    def age(self):
+        return self.last_update
+
+    def update(self, t, x, y):
+        prev_position, prev_update = self.last_position, self.last_update
+        self.last_position, self.last_update = Vector3(x, y, 0.1), t
+
+        if self.age() >= self.warmup_time:
+            pos = self.last_position
+            ds = math.sqrt((pos.x - prev_position.x) ** 2 + (pos.y - prev_position.y) ** 2)
+            self._add_sample(pos, t, ds, t - prev_update)
+            self.samples.append((x, y, t, ds, t - prev_update))
+
+        self.cache.clear()
+
+
+def make_conf(**kwargs):
+    conf = dict(evaluation_time=12.0, warmup_time=1.0, pose_update_frequency=5)
+    conf.update(kwargs)
+    return Namespace(**conf)
+
+
+def random_walk(rng, n, max_step):
+    """
+    Yields `n` positions, each at most `max_step` from the last.
+    """
+    x = y = 0.0
+    angle = rng.uniform(0, 2 * math.pi)
+    for _ in range(n):
+        # Mostly straight lines, with the occasional turn or stop
+        if rng.random() < 0.1:
+            angle = rng.uniform(0, 2 * math.pi)
+
+        step = 0.0 if rng.random() < 0.1 else rng.uniform(0, max_step)
+        x += step * math.cos(angle)
+        y += step * math.sin(angle)
+        yield x, y
+
+
+def out_and_back(rng, n, max_step):
+    """
+    Yields `n` positions of a robot that moves away at full speed
+    and comes back, so its displacement is largest mid-way.
+    """
+    angle = rng.uniform(0, 2 * math.pi)
+    turn = rng.randint(1, n - 1)
+    for i in range(n):
+        d = max_step * (i if i < turn else max(0, 2 * turn - i))
+        yield d * math.cos(angle), d * math.sin(angle)
+
+
+class TestSpeedWindow(unittest.TestCase):
+    def assertMatchesSamples(self, robot):
+        """
+        Compares the window values with those computed from the
+        last samples that fit in the window.
+        """
+        window = robot.samples[-robot._win_size:]
+        if not window:
+            self.assertEqual(robot.velocity(), 0.0)
+            self.assertEqual(robot.displacement_velocity(), 0.0)
+            return
+
+        path = sum(s[3] for s in window)
+        elapsed = sum(s[4] for s in window)
+        self.assertAlmostEqual(robot.velocity(), path / elapsed if elapsed > 0 else 0.0)
+
+        (x0, y0, t0, _, _), (x1, y1, t1, _, _) = window[0], window[-1]
+        dist = math.sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
+        self.assertAlmostEqual(robot.displacement_velocity(), dist / (t1 - t0) if t1 > t0 else 0.0)
+
+    def test_matches_samples(self):
+        rng = random.Random(11)
+        for freq, evaluation_time in ((5, 12.0), (3, 2.0), (10, 0.1), (7, 4.5)):
+            conf = make_conf(pose_update_frequency=freq, evaluation_time=evaluation_time)
+            robot = WindowRobot(conf)
+            t = 0.0
+            for x, y in random_walk(rng, 200, 0.1):
+                # Irregular pose updates
+                t += rng.uniform(0.5, 1.5) / freq
+                robot.update(t, x, y)
+                self.assertMatchesSamples(robot)
+
+            self.assertEqual(robot._win_count, min(robot._win_size, len(robot.samples)))
+
+    def test_values_are_cached(self):
+        robot = WindowRobot(make_conf())
+        for i, (x, y) in enumerate(random_walk(random.Random(3), 20, 0.1)):
+            robot.update(1.0 + 0.2 * i, x, y)
+
+        velocity = robot.velocity()
+        self.assertEqual(robot.velocity(), velocity)
+        self.assertEqual(robot.cache_hits, 1)
+
+        robot.update(10.0, 5.0, 5.0)
+        self.assertNotEqual(robot.velocity(), velocity)
+        self.assertMatchesSamples(robot)
+
+
+class TestFitnessBound(unittest.TestCase):
+    def evaluate(self, conf, path, max_speed, racing_interval):
+        """
+        Runs an evaluation the way racing does, with pose updates until
+        the robot's age reaches the end of the evaluation.
+        :return: Bounds at every racing check, final fitness
+        """
+        robot = WindowRobot(conf)
+        max_age = conf.evaluation_time + conf.warmup_time
+        dt = 1.0 / conf.pose_update_frequency
+        bounds = []
+        t = 0.0
+        check = racing_interval
+        for x, y in path:
+            # Times are sums of the update interval, which
+            # may take one extra update to reach `max_age`.
+            t += dt
+            robot.update(t, x, y)
+            if robot.age() >= max_age:
+                return bounds, robot.fitness()
+
+            if robot.age() >= check:
+                check += racing_interval
+                bounds.append(robot.fitness_bound(max_speed))
+
+        self.fail("Path too short for the evaluation.")
+
+    def test_bound_holds(self):
+        rng = random.Random(5)
+        max_speed = 0.5
+        for freq, evaluation_time, warmup_time in ((5, 12.0, 1.0), (3, 10.0, 0.5),
+                                                   (10, 6.1, 0.0), (7, 5.0, 2.3)):
+            conf = make_conf(pose_update_frequency=freq, evaluation_time=evaluation_time,
+                             warmup_time=warmup_time)
+            n = int((evaluation_time + warmup_time + 1) * freq)
+            for walk in (random_walk, out_and_back):
+                for _ in range(50):
+                    path = list(walk(rng, n, max_speed / freq))
+                    bounds, fitness = self.evaluate(conf, path, max_speed, rng.uniform(0.3, 2.0))
+                    self.assertTrue(bounds)
+                    for bound in bounds:
+                        self.assertGreaterEqual(bound, fitness)
+
+    def test_bound_tightens(self):
+        # A robot that stands still can be cut early
+        conf = make_conf()
+        bounds, fitness = self.evaluate(conf, [(0.0, 0.0)] * 100, 0.5, 1.0)
+        self.assertEqual(fitness, 0.0)
+        self.assertEqual(bounds, sorted(bounds, reverse=True))
+        self.assertLess(bounds[-1], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
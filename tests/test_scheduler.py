@@ -0,0 +1,127 @@
+import time
+import unittest
+
+import trollius
+from trollius import From
+
+from tol.manage.scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.loop = trollius.new_event_loop()
+        trollius.set_event_loop(self.loop)
+        self.scheduler = Scheduler()
+        self.calls = []
+
+    def tearDown(self):
+        self.loop.close()
+        trollius.set_event_loop(None)
+
+    def record(self, name):
+        return lambda: self.calls.append((name, self.scheduler.now))
+
+    def advance(self, now):
+        self.scheduler.update(now)
+        self.loop.run_until_complete(self.scheduler.run_due(timeout=0))
+
+    def test_every(self):
+        self.scheduler.every('a', 1.0, self.record('a'))
+        for now in (0.5, 1.0, 1.5, 2.2, 2.9, 3.0):
+            self.advance(now)
+
+        self.assertEqual(self.calls, [('a', 1.0), ('a', 2.2), ('a', 3.0)])
+
+    def test_missed_intervals_are_skipped(self):
+        self.scheduler.every('a', 1.0, self.record('a'), start=0.0)
+        self.advance(0.0)
+        self.advance(5.5)
+        self.advance(6.0)
+        self.advance(6.5)
+        self.assertEqual(self.calls, [('a', 0.0), ('a', 5.5), ('a', 6.5)])
+
+    def test_at_and_order(self):
+        self.scheduler.at('b', 2.0, self.record('b'))
+        self.scheduler.at('a', 1.0, self.record('a'))
+        self.advance(3.0)
+        self.advance(4.0)
+        self.assertEqual([name for name, _ in self.calls], ['a', 'b'])
+        self.assertEqual(self.scheduler.tasks, {})
+
+    def test_cancel_and_replace(self):
+        self.scheduler.every('a', 1.0, self.record('a'))
+        self.scheduler.at('b', 1.0, self.record('b'))
+        self.scheduler.cancel('a')
+        self.scheduler.at('b', 2.0, self.record('c'))
+        self.advance(1.0)
+        self.assertEqual(self.calls, [])
+        self.advance(2.0)
+        self.assertEqual([name for name, _ in self.calls], ['c'])
+
+    def test_cancel_due_task(self):
+        self.scheduler.at('a', 1.0, self.record('a'))
+        self.scheduler.update(1.0)
+        self.scheduler.cancel('a')
+        self.loop.run_until_complete(self.scheduler.run_due(timeout=0))
+        self.assertEqual(self.calls, [])
+
+    def test_zero_interval(self):
+        self.scheduler.every('a', 0.0, self.record('a'), start=0.0)
+        for now in (0.0, 0.1, 0.2):
+            self.advance(now)
+
+        self.assertEqual(len(self.calls), 3)
+
+    def test_coroutine_callback(self):
+        @trollius.coroutine
+        def callback():
+            yield From(trollius.sleep(0.01))
+            self.calls.append('done')
+
+        self.scheduler.at('a', 1.0, callback)
+        self.advance(1.0)
+        self.assertEqual(self.calls, ['done'])
+        self.assertEqual(self.scheduler.tasks, {})
+
+    def test_stats(self):
+        self.scheduler.every('a', 1.0, self.record('a'))
+        self.advance(1.0)
+        self.advance(2.0)
+        calls, runtime = self.scheduler.stats()['a']
+        self.assertEqual(calls, 2)
+        self.assertGreaterEqual(runtime, 0.0)
+
+    def test_run_due_timeout(self):
+        self.scheduler.every('a', 1.0, self.record('a'))
+        before = time.time()
+        self.loop.run_until_complete(self.scheduler.run_due(timeout=0.05))
+        self.assertGreaterEqual(time.time() - before, 0.04)
+        self.assertEqual(self.calls, [])
+        self.assertIsNone(self.scheduler._waiter)
+
+    def test_run_due_waits_for_update(self):
+        self.scheduler.every('a', 1.0, self.record('a'))
+        self.loop.call_later(0.01, self.scheduler.update, 1.0)
+        self.loop.run_until_complete(self.scheduler.run_due())
+        self.assertEqual(self.calls, [('a', 1.0)])
+
+    def test_clear(self):
+        self.scheduler.every('a', 1.0, self.record('a'))
+        self.scheduler.update(1.0)
+        self.scheduler.clear()
+        self.assertEqual(self.scheduler.now, 1.0)
+        self.advance(2.0)
+        self.assertEqual(self.calls, [])
+
+    def test_every_after_clear(self):
+        self.scheduler.update(5000.0)
+        self.scheduler.clear()
+        self.scheduler.every('snapshot', 100.0, self.record('snapshot'))
+        self.advance(5001.0)
+        self.assertEqual(self.calls, [])
+        self.advance(5100.0)
+        self.assertEqual(self.calls, [('snapshot', 5100.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
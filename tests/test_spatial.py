@@ -0,0 +1,99 @@
+import math
+import random
+import unittest
+
+from tol.manage.spatial import SpatialGrid
+
+
+def brute_force(points, x, y, radius):
+    result = {}
+    for key, (px, py) in points.items():
+        dist = math.sqrt((px - x) ** 2 + (py - y) ** 2)
+        if dist <= radius:
+            result[key] = dist
+
+    return result
+
+
+class TestSpatialGrid(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(42)
+        self.points = {}
+        self.grid = SpatialGrid(1.0)
+        for i in range(200):
+            self.move(i)
+
+    def move(self, key):
+        x, y = self.rng.uniform(-10, 10), self.rng.uniform(-10, 10)
+        self.points[key] = (x, y)
+        self.grid.update(key, x, y)
+
+    def assertQueryMatches(self, x, y, radius):
+        result = dict(self.grid.query_radius(x, y, radius))
+        expected = brute_force(self.points, x, y, radius)
+        self.assertEqual(sorted(result), sorted(expected))
+        for key, dist in expected.items():
+            self.assertAlmostEqual(result[key], dist)
+
+    def test_query_radius(self):
+        # Both small radii, for which the cells around the position are
+        # visited, and large ones, for which all occupied cells are.
+        for radius in (0.0, 0.3, 1.0, 2.5, 8.0, 40.0):
+            for _ in range(20):
+                self.assertQueryMatches(self.rng.uniform(-12, 12), self.rng.uniform(-12, 12), radius)
+
+    def test_update_and_remove(self):
+        for _ in range(3):
+            for key in self.rng.sample(sorted(self.points), 50):
+                self.move(key)
+
+            for key in self.rng.sample(sorted(self.points), 20):
+                del self.points[key]
+                self.grid.remove(key)
+
+            self.assertEqual(len(self.grid), len(self.points))
+            self.assertEqual(sorted(self.grid.keys()), sorted(self.points))
+            self.assertQueryMatches(0, 0, 5.0)
+
+        # Cells of moved and removed items don't stay behind
+        cells = set(self.grid._cell(x, y) for x, y in self.points.values())
+        self.assertEqual(set(self.grid.cells), cells)
+
+    def test_remove_missing(self):
+        self.grid.remove('missing')
+        self.assertEqual(len(self.grid), 200)
+        self.assertNotIn('missing', self.grid)
+
+    def test_negative_coordinates(self):
+        grid = SpatialGrid(1.0)
+        grid.update('a', -0.5, -0.5)
+        grid.update('b', 0.5, 0.5)
+        self.assertEqual(grid._cell(-0.5, -0.5), (-1, -1))
+        self.assertEqual(sorted(k for k, _ in grid.query_radius(0, 0, 0.8)), ['a', 'b'])
+
+    def test_nearest(self):
+        for _ in range(50):
+            x, y = self.rng.uniform(-15, 15), self.rng.uniform(-15, 15)
+            exclude = self.rng.choice(sorted(self.points))
+            key, dist = self.grid.nearest(x, y, exclude=exclude)
+
+            expected = min(math.sqrt((px - x) ** 2 + (py - y) ** 2)
+                           for k, (px, py) in self.points.items() if k != exclude)
+            self.assertNotEqual(key, exclude)
+            self.assertAlmostEqual(dist, expected)
+
+    def test_nearest_empty(self):
+        self.assertEqual(SpatialGrid(1.0).nearest(0, 0), (None, float('inf')))
+
+        grid = SpatialGrid(1.0)
+        grid.update('a', 0, 0)
+        self.assertEqual(grid.nearest(0, 0, exclude='a'), (None, float('inf')))
+
+    def test_clear(self):
+        self.grid.clear()
+        self.assertEqual(len(self.grid), 0)
+        self.assertEqual(self.grid.query_radius(0, 0, 100), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
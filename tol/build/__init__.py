@@ -1,2 +1,3 @@
 __author__ = 'Elte Hupkes'
 from .builder import get_builder, get_simulation_robot
+from .intersection import count_intersections
@@ -0,0 +1,137 @@
+"""
+Local body intersection check, used to reject robots with obviously
+intersecting body parts without a round trip to the body analyzer.
+"""
+from __future__ import absolute_import
+import math
+import itertools
+import xml.etree.ElementTree as ET
+
+
+def count_intersections(sdf, margin=0.0):
+    """
+    Counts the pairs of box collisions in the robot model of the given
+    SDF that intersect. As in the physics engine, collisions in links
+    that are connected by a joint are not checked against each other.
+    Other geometries than boxes are ignored, so a result of zero
+    does not guarantee the body is valid.
+
+    :param sdf: SDF containing a single robot model
+    :param margin: Every box is shrunk by this margin on all sides before
+                   testing, so that only overlaps deeper than twice the
+                   margin are counted.
+    :return:
+    :rtype: int
+    """
+    model = ET.fromstring(str(sdf)).find('model')
+    joined = set()
+    for joint in model.iter('joint'):
+        joined.add(frozenset((joint.findtext('parent'), joint.findtext('child'))))
+
+    boxes = []
+    for link in model.iter('link'):
+        link_rot, link_pos = _parse_pose(link)
+        for collision in link.iter('collision'):
+            size = collision.findtext('geometry/box/size')
+            if size is None:
+                continue
+
+            half = [0.5 * float(v) - margin for v in size.split()]
+            if min(half) <= 0:
+                continue
+
+            rot, pos = _parse_pose(collision)
+            boxes.append((link.get('name'), _mat_mul(link_rot, rot),
+                          _add(_mat_vec(link_rot, pos), link_pos), half))
+
+    count = 0
+    for a, b in itertools.combinations(boxes, 2):
+        if a[0] == b[0] or frozenset((a[0], b[0])) in joined:
+            continue
+
+        if _boxes_intersect(a[1:], b[1:]):
+            count += 1
+
+    return count
+
+
+def _parse_pose(element):
+    """
+    :param element:
+    :return: Rotation matrix and position of the element's pose
+    """
+    text = element.findtext('pose')
+    if not text:
+        return ((1, 0, 0), (0, 1, 0), (0, 0, 1)), (0, 0, 0)
+
+    x, y, z, roll, pitch, yaw = [float(v) for v in text.split()]
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    rot = ((cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr),
+           (sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr),
+           (-sp, cp * sr, cp * cr))
+    return rot, (x, y, z)
+
+
+def _mat_mul(a, b):
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3))
+                 for i in range(3))
+
+
+def _mat_vec(a, v):
+    return tuple(sum(a[i][k] * v[k] for k in range(3)) for i in range(3))
+
+
+def _add(a, b):
+    return a[0] + b[0], a[1] + b[1], a[2] + b[2]
+
+
+def _boxes_intersect(a, b, eps=1e-9):
+    """
+    Separating axis test for two oriented boxes.
+
+    :param a: Tuple of (rotation, center, half sizes)
+    :param b: Tuple of (rotation, center, half sizes)
+    :return:
+    """
+    rot_a, pos_a, ha = a
+    rot_b, pos_b, hb = b
+
+    # Box axes are the columns of the rotation matrices
+    axes_a = [tuple(rot_a[k][i] for k in range(3)) for i in range(3)]
+    axes_b = [tuple(rot_b[k][i] for k in range(3)) for i in range(3)]
+
+    def dot(u, v):
+        return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+
+    # Rotation of b expressed in a's frame, and the translation
+    # between the centers in a's frame.
+    r = [[dot(axes_a[i], axes_b[j]) for j in range(3)] for i in range(3)]
+    abs_r = [[abs(r[i][j]) + eps for j in range(3)] for i in range(3)]
+    d = (pos_b[0] - pos_a[0], pos_b[1] - pos_a[1], pos_b[2] - pos_a[2])
+    t = [dot(d, axes_a[i]) for i in range(3)]
+
+    # Axes of a
+    for i in range(3):
+        if abs(t[i]) > ha[i] + sum(hb[j] * abs_r[i][j] for j in range(3)):
+            return False
+
+    # Axes of b
+    for j in range(3):
+        proj = abs(sum(t[i] * r[i][j] for i in range(3)))
+        if proj > hb[j] + sum(ha[i] * abs_r[i][j] for i in range(3)):
+            return False
+
+    # Cross products of the axes
+    for i in range(3):
+        i1, i2 = (i + 1) % 3, (i + 2) % 3
+        for j in range(3):
+            j1, j2 = (j + 1) % 3, (j + 2) % 3
+            proj = abs(t[i2] * r[i1][j] - t[i1] * r[i2][j])
+            ra = ha[i1] * abs_r[i2][j] + ha[i2] * abs_r[i1][j]
+            rb = hb[j1] * abs_r[i][j2] + hb[j2] * abs_r[i][j1]
+            if proj > ra + rb:
+                return False
+
+    return True
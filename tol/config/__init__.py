@@ -1,2 +1,2 @@
-from .config import parser, str_to_address
+from .config import parser, str_to_address, instance_address
 __author__ = 'Elte Hupkes'
@@ -61,6 +61,20 @@ def str_to_address(v):
     return host, int(port)
 
 
+def instance_address(v, index):
+    """
+    Returns the address of the simulator / analyzer instance with the
+    given index, which is found at the given port plus 2 * index.
+    :type v: str
+    :type index: int
+    """
+    if not v:
+        return v
+
+    host, port = str_to_address(v)
+    return "%s:%d" % (host, port + 2 * index)
+
+
 parser = CustomParser(fromfile_prefix_chars='@')
 parser.add_argument(
     '--sensor-update-rate',
@@ -205,6 +219,50 @@ parser.add_argument(
     help="Directory where robot statistics are written."
 )
 
+parser.add_argument(
+    '--analyzer-window',
+    default=1, type=int,
+    help="The number of candidates kept waiting for the analyzer when generating a population. "
+         "Larger values generate new candidates while earlier ones are being analyzed, the "
+         "analyzer still receives one request at a time."
+)
+
+parser.add_argument(
+    '--analyzer-cache-size',
+    default=0, type=int,
+    help="The maximum number of body analyzer results to cache, keyed by "
+         "robot body. Set to 0 to disable the cache."
+)
+
+parser.add_argument(
+    '--analyzer-cache-file',
+    default=None, type=str,
+    help="File the analyzer cache is loaded from and saved to, which allows "
+         "reusing it between experiments. The cache is not persisted if this "
+         "is not given."
+)
+
+parser.add_argument(
+    '--local-prescreen',
+    default=False, type=str_to_bool,
+    help="Check robot bodies for obviously intersecting parts locally, "
+         "and only send bodies that pass this check to the analyzer."
+)
+
+parser.add_argument(
+    '--prescreen-margin',
+    default=0.002, type=float,
+    help="Margin in meters by which collision boxes are shrunk in the local prescreen, "
+         "so that only clear overlaps lead to rejection."
+)
+
+parser.add_argument(
+    '--spatial-cell-size',
+    default=1.0, type=float,
+    help="Cell size in meters of the grid used to find nearby robots, preferably "
+         "on the order of the distances queried (e.g. mating / drop distances)."
+)
+
 parser.add_argument(
     '--restore-directory',
     default=None, type=str,
@@ -1,2 +1,3 @@
 __author__ = 'Elte Hupkes'
 from .logger import logger, output_console, log_debug
+from .columns import ColumnLog, LogWriter, read_columns, export_csv
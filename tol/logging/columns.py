@@ -0,0 +1,225 @@
+"""
+Buffered, columnar logging of numeric rows. Rows are collected
+into typed column arrays and written in chunks by a background
+thread, so writing log files does not block the event loop.
+
+A log is written either as CSV or in a compact binary format,
+which is a header with the column specification followed by
+chunks of raw column arrays. Binary logs use the native byte order
+and item sizes, `export_csv` converts them to CSV files.
+"""
+from __future__ import absolute_import
+import csv
+import os
+import struct
+import threading
+import Queue
+from array import array
+
+from .logger import logger
+
+MAGIC = b'TOLCOL1\n'
+_COUNT = struct.Struct('<I')
+
+
+class LogWriter(object):
+    """
+    Background thread that performs the file writes of one
+    or more column logs, in the order they were submitted.
+    """
+
+    def __init__(self):
+        self.queue = Queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='tol-log-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, func, *args):
+        """
+        Schedules `func(*args)` on the writer thread.
+        :param func:
+        :param args:
+        :return:
+        """
+        self.queue.put((func, args))
+
+    def sync(self):
+        """
+        Blocks until all submitted writes have been performed.
+        :return:
+        """
+        self.queue.join()
+
+    def stop(self):
+        """
+        Performs the remaining writes and stops the writer thread.
+        :return:
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+
+                func, args = item
+                func(*args)
+            except Exception:
+                logger.exception("Error writing log chunk.")
+            finally:
+                self.queue.task_done()
+
+
+class ColumnLog(object):
+    """
+    Log file with a fixed set of typed columns.
+    """
+
+    def __init__(self, filename, columns, writer, binary=False, chunk_size=1024, append=False):
+        """
+        :param filename:
+        :param columns: List of (name, typecode) tuples, with `array` typecodes
+        :param writer:
+        :type writer: LogWriter
+        :param binary: Write the binary format rather than CSV
+        :param chunk_size: Number of buffered rows that triggers a write
+        :param append: Append to an existing log rather than creating a new one
+        :return:
+        """
+        self.filename = filename
+        self.columns = columns
+        self.writer = writer
+        self.binary = binary
+        self.chunk_size = max(1, chunk_size)
+        self.file = open(filename, 'ab' if append else 'wb')
+        self.rows = 0
+        self.data = self._empty()
+
+        if not append:
+            writer.submit(self._write_header)
+
+    def _empty(self):
+        return [array(typecode) for _, typecode in self.columns]
+
+    def append(self, row):
+        """
+        Adds a row to the log, the values should match the column types.
+        :param row:
+        :return:
+        """
+        for column, value in zip(self.data, row):
+            column.append(value)
+
+        self.rows += 1
+        if self.rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the buffered rows to the writer thread.
+        :return:
+        """
+        if not self.rows:
+            return
+
+        data, self.data, self.rows = self.data, self._empty(), 0
+        self.writer.submit(self._write_chunk, data)
+
+    def sync(self):
+        """
+        Flushes the buffered rows and waits until they are on disk.
+        :return:
+        """
+        self.flush()
+        self.writer.sync()
+
+    def offset(self):
+        """
+        Returns the size of the log file once all buffered rows
+        have been written, which can be passed to `truncate` to
+        restore the log to this point.
+        :return:
+        """
+        self.sync()
+        return os.fstat(self.file.fileno()).st_size
+
+    def truncate(self, offset):
+        """
+        Discards everything written after the given offset.
+        :param offset:
+        :return:
+        """
+        self.rows = 0
+        self.data = self._empty()
+        self.writer.sync()
+        self.file.truncate(offset)
+
+    def close(self):
+        """
+        :return:
+        """
+        self.flush()
+        self.writer.submit(self.file.close)
+        self.writer.sync()
+
+    def _write_header(self):
+        if self.binary:
+            spec = ' '.join('%s:%s' % column for column in self.columns).encode('ascii')
+            self.file.write(MAGIC + _COUNT.pack(len(spec)) + spec)
+        else:
+            csv.writer(self.file, delimiter=',').writerow([name for name, _ in self.columns])
+
+        self.file.flush()
+
+    def _write_chunk(self, data):
+        if self.binary:
+            self.file.write(_COUNT.pack(len(data[0])))
+            for column in data:
+                column.tofile(self.file)
+        else:
+            csv.writer(self.file, delimiter=',').writerows(zip(*data))
+
+        self.file.flush()
+
+
+def read_columns(filename):
+    """
+    Reads a binary column log.
+    :param filename:
+    :return: List of (name, typecode) tuples and a list with an array per column
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("`%s` is not a binary column log." % filename)
+
+        length, = _COUNT.unpack(f.read(_COUNT.size))
+        columns = [tuple(str(c).split(':')) for c in f.read(length).decode('ascii').split(' ')]
+        data = [array(typecode) for _, typecode in columns]
+
+        while True:
+            count = f.read(_COUNT.size)
+            if not count:
+                break
+
+            n, = _COUNT.unpack(count)
+            for column in data:
+                column.fromfile(f, n)
+
+    return columns, data
+
+
+def export_csv(filename, csv_filename):
+    """
+    Converts a binary column log to a CSV file.
+    :param filename:
+    :param csv_filename:
+    :return:
+    """
+    columns, data = read_columns(filename)
+    with open(csv_filename, 'wb') as f:
+        writer = csv.writer(f, delimiter=',')
+        writer.writerow([name for name, _ in columns])
+        writer.writerows(zip(*data))
@@ -0,0 +1,236 @@
+from __future__ import absolute_import
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+
+def body_key(body):
+    """
+    Returns a canonical key for the given robot body, which only
+    depends on the part types, orientations, parameters and the
+    way parts are connected - not on part IDs or the robot brain.
+
+    :param body: Body protobuf message
+    :return:
+    :rtype: str
+    """
+    return hashlib.sha1(repr(_part_structure(body.root))).hexdigest()
+
+
+def genome_key(robot):
+    """
+    Returns a canonical key for the body and brain of the given robot.
+    Like `body_key` it does not depend on part IDs; neurons are identified
+    by the position of their part in the body rather than by their ID.
+
+    :param robot: Robot protobuf message
+    :return:
+    :rtype: str
+    """
+    paths = {}
+    _part_paths(robot.body.root, (), paths)
+
+    names = {}
+    for neuron in robot.brain.neuron:
+        path = paths.get(neuron.partId)
+        name = neuron.id
+        if path is not None and name.startswith(neuron.partId):
+            name = name[len(neuron.partId):]
+
+        names[neuron.id] = (path, name)
+
+    neurons = sorted((names[n.id], n.layer, n.type, tuple(param.value for param in n.param))
+                     for n in robot.brain.neuron)
+    connections = sorted((names[c.src], names[c.dst], c.weight) for c in robot.brain.connection)
+    return hashlib.sha1(repr((_part_structure(robot.body.root), neurons, connections))).hexdigest()
+
+
+def _part_paths(part, path, paths):
+    """
+    Stores the path of slots from the root to every part by part ID.
+    :param part: BodyPart protobuf message
+    :param path:
+    :param paths:
+    :return:
+    """
+    paths[part.id] = path
+    for conn in part.child:
+        _part_paths(conn.part, path + ((conn.src_slot, conn.dst_slot),), paths)
+
+
+def _part_structure(part):
+    """
+    :param part: BodyPart protobuf message
+    :return: Nested tuple describing the part and its children
+    """
+    children = sorted((conn.src_slot, conn.dst_slot, _part_structure(conn.part))
+                      for conn in part.child)
+    return (part.type, part.orientation,
+            tuple(param.value for param in part.param), tuple(children))
+
+
+class AnalyzerCache(object):
+    """
+    Least recently used cache of body analyzer results, keyed
+    by `body_key`.
+    """
+
+    def __init__(self, size, filename=None):
+        """
+        :param size: Maximum number of cached results
+        :param filename: If given, the cache is loaded from and saved
+                         to this file.
+        :return:
+        """
+        self.size = size
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+        if filename and os.path.exists(filename):
+            self.load()
+
+    def get(self, key):
+        """
+        Returns the cached result for the given key, or `None`
+        if it is not in the cache.
+        :param key:
+        :return:
+        """
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        # Reinsert to mark the entry as most recently used
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        :param key:
+        :param value:
+        :return:
+        """
+        self.entries.pop(key, None)
+        self.entries[key] = value
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        """
+        :return:
+        """
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def load(self):
+        """
+        Loads cache entries from the cache file.
+        :return:
+        """
+        with open(self.filename, 'rb') as f:
+            entries = pickle.load(f)
+
+        for key, value in entries:
+            self.put(key, value)
+
+    def save(self):
+        """
+        Writes the cache entries to the cache file, if there is one.
+        :return:
+        """
+        if not self.filename:
+            return
+
+        with open(self.filename, 'wb') as f:
+            pickle.dump(list(self.entries.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class FitnessCache(object):
+    """
+    Evaluated robots by `genome_key`, so that identical genomes are
+    only evaluated a limited number of times. The fitness of a genome
+    is the average over its evaluations.
+    """
+
+    def __init__(self, max_evaluations):
+        """
+        :param max_evaluations: Number of evaluations after which
+                                a genome is no longer evaluated.
+        :return:
+        """
+        self.max_evaluations = max_evaluations
+        self.entries = {}
+        self.keys = {}
+        self.hits = 0
+        self.misses = 0
+
+    def robots(self, key):
+        """
+        :param key:
+        :return: List of evaluated robots with the given genome
+        """
+        return self.entries.get(key, [])
+
+    def needs_evaluation(self, key, planned=0):
+        """
+        :param key:
+        :param planned: Number of evaluations of the genome already planned
+        :return: Whether the genome should be evaluated (again)
+        """
+        return len(self.robots(key)) + planned < self.max_evaluations
+
+    def add(self, key, robot):
+        """
+        Stores an evaluated robot.
+        :param key:
+        :param robot:
+        :return:
+        """
+        self.entries.setdefault(key, []).append(robot)
+        self.keys[robot.name] = key
+
+    def reuse(self, key, robot):
+        """
+        Registers a robot that reuses the evaluations of its genome
+        rather than being evaluated itself.
+        :param key:
+        :param robot:
+        :return:
+        """
+        self.keys[robot.name] = key
+        self.hits += 1
+
+    def clear(self):
+        """
+        Removes all evaluations and resets the counters.
+        :return:
+        """
+        self.entries.clear()
+        self.keys.clear()
+        self.hits = self.misses = 0
+
+    def hit_rate(self):
+        """
+        :return:
+        """
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def fitness(self, robot):
+        """
+        :param robot:
+        :return: Average fitness of the genome of the given robot, or the
+                 robot's own fitness if it is not in the cache.
+        """
+        robots = self.entries.get(self.keys.get(robot.name))
+        if not robots:
+            return robot.fitness()
+
+        return sum(r.fitness() for r in robots) / len(robots)
@@ -0,0 +1,109 @@
+from __future__ import absolute_import
+import bisect
+import math
+
+
+class MateIndex(object):
+    """
+    Index used to find the robot pairs that are willing to mate with
+    each other without testing every pair. Robots can only mate if both
+    are ready to mate, have a nonzero fitness, are within the mating
+    distance and their fitness ratio is within the mating fitness
+    threshold, so candidates are looked up in fitness sorted buckets
+    of a grid with cells the size of the mating distance. Candidates
+    are then checked with `Robot.will_mate_with`, so the result is the
+    same as that of checking every pair.
+
+    The index reflects the state of the robots at the time it is
+    created, so it should be created again when the robots change.
+    """
+
+    def __init__(self, robots, conf):
+        """
+        :param robots: List of robots, the order of which determines the
+                       order of the returned pairs.
+        :type robots: list[Robot]
+        :param conf:
+        :return:
+        """
+        self.robots = robots
+        self.order = {robot.name: i for i, robot in enumerate(robots)}
+        self.cell_size = max(conf.mating_distance_threshold, 1e-6)
+        self.threshold = conf.mating_fitness_threshold
+
+        # Maps grid cells to a sorted list of fitness values
+        # and the corresponding robots.
+        self.cells = {}
+        for robot in robots:
+            if not robot.mating_ready():
+                continue
+
+            fitness = robot.fitness()
+            if fitness <= 0:
+                continue
+
+            keys, entries = self.cells.setdefault(self._cell(robot), ([], []))
+            pos = bisect.bisect_right(keys, fitness)
+            keys.insert(pos, fitness)
+            entries.insert(pos, robot)
+
+    def _cell(self, robot):
+        pos = robot.last_position
+        return int(math.floor(pos.x / self.cell_size)), int(math.floor(pos.y / self.cell_size))
+
+    def candidates(self, ra):
+        """
+        Returns the robots in the cells around `ra` with a fitness
+        compatible with that of `ra`. This is a superset of the robots
+        that are willing to mate with `ra`.
+        :param ra:
+        :return:
+        """
+        fitness = ra.fitness()
+        if fitness <= 0 or not ra.mating_ready():
+            return []
+
+        # Both fitness ratios have to be at least the threshold. The bounds
+        # are widened a little so rounding cannot exclude any candidate.
+        if self.threshold > 0:
+            low, high = self.threshold * fitness * (1 - 1e-9), fitness / self.threshold * (1 + 1e-9)
+        else:
+            low, high = 0.0, float('inf')
+
+        cx, cy = self._cell(ra)
+        result = []
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                cell = self.cells.get((i, j))
+                if not cell:
+                    continue
+
+                keys, entries = cell
+                result += entries[bisect.bisect_left(keys, low):bisect.bisect_right(keys, high)]
+
+        return [rb for rb in result if rb is not ra]
+
+    def mates(self, ra):
+        """
+        :param ra:
+        :return: All robots that `ra` can mate with, in the order of
+                 the robot list.
+        """
+        mates = [rb for rb in self.candidates(ra) if ra.will_mate_with(rb) and rb.will_mate_with(ra)]
+        return sorted(mates, key=lambda rb: self.order[rb.name])
+
+    def pairs(self):
+        """
+        :return: All pairs of robots that can mate, in the same order as
+                 going through all combinations of the robot list.
+        """
+        order = self.order
+        pairs = []
+        for ra in self.robots:
+            idx = order[ra.name]
+            mates = [rb for rb in self.candidates(ra) if order[rb.name] > idx and
+                     ra.will_mate_with(rb) and rb.will_mate_with(ra)]
+            mates.sort(key=lambda rb: order[rb.name])
+            pairs += [(ra, rb) for rb in mates]
+
+        return pairs
@@ -0,0 +1,121 @@
+from __future__ import absolute_import
+from collections import deque
+
+import trollius
+from trollius import From, Future
+
+from ..logging import logger
+
+
+class OffspringPipeline(object):
+    """
+    Produces children for eligible parent pairs in the background, keeping
+    a small buffer of candidates that passed crossover, mutation and body
+    analysis. Candidates are dropped when one of their parents dies, and
+    are checked for mating eligibility again when they are taken.
+    """
+
+    def __init__(self, world, size, select_pair, idle_time=1.0, retry_time=0.5):
+        """
+        :param world:
+        :type world: World
+        :param size: Maximum number of buffered candidates
+        :param select_pair: Function returning a (ra, rb) tuple of robots
+                            to mate, or `None` if there is no eligible pair.
+        :param idle_time: Simulation seconds to wait when there is no eligible pair
+        :param retry_time: Simulation seconds to wait after a failed attempt
+        :return:
+        """
+        self.world = world
+        self.size = size
+        self.select_pair = select_pair
+        self.idle_time = idle_time
+        self.retry_time = retry_time
+        self.ready = deque()
+        self.attempts = 0
+        self.invalidated = 0
+        self._task = None
+        self._space = None
+
+    def start(self):
+        """
+        Starts producing candidates.
+        :return:
+        """
+        if self._task is None:
+            self._task = trollius.Task(self._run())
+
+    def stop(self):
+        """
+        Stops producing candidates and clears the buffer.
+        :return:
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self.ready.clear()
+
+    def pop(self):
+        """
+        Takes the next candidate whose parents are alive and still
+        willing to mate.
+        :return: (tree, bbox, (ra, rb)) tuple, or `None` if no candidate is ready.
+        """
+        if self._task is not None and self._task.done():
+            # Raises the error that stopped the pipeline
+            self._task.result()
+
+        candidate = None
+        while self.ready:
+            tree, bbox, (ra, rb) = self.ready.popleft()
+            if self._alive(ra) and self._alive(rb) and \
+                    ra.will_mate_with(rb) and rb.will_mate_with(ra):
+                candidate = tree, bbox, (ra, rb)
+                break
+
+            self.invalidated += 1
+
+        if self._space is not None and not self._space.done():
+            self._space.set_result(None)
+
+        return candidate
+
+    def invalidate(self, robot):
+        """
+        Drops the candidates that have the given robot as a parent.
+        :param robot:
+        :return:
+        """
+        keep = [c for c in self.ready if robot not in c[2]]
+        self.invalidated += len(self.ready) - len(keep)
+        self.ready = deque(keep)
+
+    def _alive(self, robot):
+        return self.world.robots.get(robot.name) is robot
+
+    @trollius.coroutine
+    def _run(self):
+        while True:
+            if len(self.ready) >= self.size:
+                self._space = Future()
+                yield From(self._space)
+                continue
+
+            pair = self.select_pair()
+            if not pair:
+                yield From(self.world.sleep_sim(self.idle_time))
+                continue
+
+            ra, rb = pair
+            self.attempts += 1
+            result = yield From(self.world.attempt_mate(ra, rb))
+
+            if not result:
+                # Wait some simulation time before the next attempt, so
+                # that attempts which keep failing don't flood the analyzer.
+                yield From(self.world.sleep_sim(self.retry_time))
+            elif self._alive(ra) and self._alive(rb):
+                child, bbox = result
+                self.ready.append((child, bbox, (ra, rb)))
+                logger.debug("Buffered candidate child, %d ready." % len(self.ready))
@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+from array import array
+
+
+class PopulationState(object):
+    """
+    Table with a row for every robot in the world, holding the columns
+    the population totals are kept for. A robot's size is fixed at
+    birth, its fitness changes with every pose update. Rather than
+    computing the fitness on every pose update, updated robots are
+    marked and their fitness is brought up to date when the fitness
+    column or total is read, so it is computed at most once per pose
+    update and only when it is needed.
+    """
+    COLUMNS = ('size', 'fitness')
+
+    # Columns of which the sum over all rows is kept up to date
+    TOTALS = ('size', 'fitness')
+
+    # Number of refreshed rows after which the sums are recomputed,
+    # so rounding errors cannot accumulate.
+    RESYNC_INTERVAL = 1024
+
+    def __init__(self, capacity=64):
+        """
+        :param capacity: Initial number of rows, the table grows
+                         when more are needed.
+        :return:
+        """
+        self.capacity = capacity
+        self.names = []
+        self.robots = []
+        self.rows = {}
+        self.columns = {c: array('d', [0.0]) * capacity for c in self.COLUMNS}
+        self.totals = dict.fromkeys(self.TOTALS, 0.0)
+        self.dirty = set()
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def update(self, robot):
+        """
+        Marks the state of the given robot as changed, adding
+        a row for it if it is not yet present.
+        :param robot:
+        :type robot: Robot
+        :return:
+        """
+        if robot.name not in self.rows:
+            self._add(robot)
+
+        self.dirty.add(robot.name)
+
+    def _add(self, robot):
+        """
+        :param robot:
+        :return: Row index of the new robot
+        """
+        row = len(self.names)
+        if row == self.capacity:
+            for col in self.columns.values():
+                col.extend(array('d', [0.0]) * self.capacity)
+
+            self.capacity *= 2
+
+        self.names.append(robot.name)
+        self.robots.append(robot)
+        self.rows[robot.name] = row
+
+        c = self.columns
+        c['size'][row] = robot.size
+        c['fitness'][row] = 0.0
+        self.totals['size'] += robot.size
+        return row
+
+    def refresh(self):
+        """
+        Writes the current fitness of all robots that were
+        updated since the last refresh.
+        :return:
+        """
+        if not self.dirty:
+            return
+
+        fitness = self.columns['fitness']
+        total = self.totals['fitness']
+        for name in self.dirty:
+            row = self.rows[name]
+            value = self.robots[row].fitness()
+            total += value - fitness[row]
+            fitness[row] = value
+
+        self.totals['fitness'] = total
+        self.updates += len(self.dirty)
+        self.dirty.clear()
+
+        if self.updates >= self.RESYNC_INTERVAL:
+            self.updates = 0
+            self.totals = self.compute_totals()
+
+    def remove(self, name):
+        """
+        Removes the row of the given robot by moving the last row
+        into its place.
+        :param name:
+        :return:
+        """
+        row = self.rows.pop(name, None)
+        if row is None:
+            return
+
+        self.dirty.discard(name)
+        for col in self.TOTALS:
+            self.totals[col] -= self.columns[col][row]
+
+        last = len(self.names) - 1
+        if row != last:
+            moved = self.names[last]
+            self.names[row] = moved
+            self.robots[row] = self.robots[last]
+            self.rows[moved] = row
+            for col in self.columns.values():
+                col[row] = col[last]
+
+        self.names.pop()
+        self.robots.pop()
+
+    def clear(self):
+        """
+        :return:
+        """
+        del self.names[:]
+        del self.robots[:]
+        self.rows.clear()
+        self.dirty.clear()
+        self.totals = dict.fromkeys(self.TOTALS, 0.0)
+
+    def column(self, name):
+        """
+        :param name:
+        :return: Copy of the values of the given column for all rows
+        :rtype: array
+        """
+        self.refresh()
+        return self.columns[name][:len(self.names)]
+
+    def total(self, name):
+        """
+        :param name: One of `TOTALS`
+        :return: Sum of the given column over all rows
+        """
+        self.refresh()
+        return self.totals[name]
+
+    def compute_totals(self):
+        """
+        Computes the column sums from scratch.
+        :return: Dictionary with the sum of each column in `TOTALS`
+        """
+        return {col: sum(self.column(col), 0.0) for col in self.TOTALS}
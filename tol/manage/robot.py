@@ -1,15 +1,41 @@
+import math
 import random
+from array import array
 
 from sdfbuilder.math import Vector3
 from revolve.util import Time
 from revolve.angle import Robot as RvRobot
 
 
+def _mate_key(other):
+    """
+    :param other: Key of `Robot.mated_with`, which is a robot name of
+                  the form `gen__<id>` in earlier versions.
+    :return: The robot ID of the other robot, or the key itself if it
+             does not contain one.
+    """
+    if isinstance(other, basestring):
+        try:
+            return int(other.rsplit('_', 1)[-1])
+        except ValueError:
+            pass
+
+    return other
+
+
 class Robot(RvRobot):
     """
     Class to manage a single robot
     """
 
+    # Attributes added by this class are stored in slots rather than
+    # in the instance dictionary, to keep the per-robot footprint small
+    # in large online populations.
+    __slots__ = ('conf', 'size', 'initial_charge', 'mated_with', 'last_mate',
+                 'cache', 'cache_hits', 'cache_misses',
+                 '_win_size', '_win_x', '_win_y', '_win_z', '_win_t', '_win_ds', '_win_dt',
+                 '_win_head', '_win_count', '_win_path', '_win_time')
+
     def __init__(self, conf, name, tree, robot, position, time, battery_level=0.0, parents=None):
         """
         :param conf:
@@ -26,19 +52,201 @@ class Robot(RvRobot):
         :type battery_level: float
         :return:
         """
-        speed_window = int(conf.evaluation_time * conf.pose_update_frequency)
+        # The speed window is kept in the ring buffer below, so the
+        # inherited window only needs to hold a single sample.
         super(Robot, self).__init__(name=name, tree=tree, robot=robot, position=position, time=time,
-                                    battery_level=battery_level, speed_window=speed_window,
+                                    battery_level=battery_level, speed_window=1,
                                     warmup_time=conf.warmup_time, parents=parents)
 
-        # Set of robots this bot has mated with
+        # Number of children with other robots, by robot ID. The
+        # configuration is shared between all robots and never copied.
         self.mated_with = {}
         self.last_mate = None
         self.conf = conf
         self.size = len(tree)
-        self.battery_level = battery_level
         self.initial_charge = battery_level
 
+        self._init_window()
+
+        # Values computed from the pose history, cleared whenever
+        # a new pose arrives. Hits / misses are counted for
+        # instrumentation purposes.
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _init_window(self):
+        """
+        Creates an empty speed window.
+        :return:
+        """
+        # Ring buffer with the positions, times, path lengths and time steps
+        # of the samples in the speed window, along with the running sums
+        # of path length and time over the window.
+        conf = self.conf
+        self._win_size = n = max(1, int(conf.evaluation_time * conf.pose_update_frequency))
+        self._win_x, self._win_y, self._win_z, self._win_t, self._win_ds, self._win_dt = \
+            [array('d', [0.0]) * n for _ in range(6)]
+        self._win_head = 0
+        self._win_count = 0
+        self._win_path = 0.0
+        self._win_time = 0.0
+
+    def __getstate__(self):
+        """
+        Includes the slot attributes in the pickled state.
+        :return:
+        """
+        state = self.__dict__.copy()
+        for attr in Robot.__slots__:
+            if hasattr(self, attr):
+                state[attr] = getattr(self, attr)
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled robot. Robots from snapshots of earlier
+        versions have `mated_with` keyed by robot name, which is
+        converted, and have no speed window or cache yet, these
+        start out empty.
+        :param state:
+        :return:
+        """
+        for attr, value in state.iteritems():
+            setattr(self, attr, value)
+
+        self.mated_with = {_mate_key(other): count for other, count in self.mated_with.iteritems()}
+
+        if not hasattr(self, '_win_size'):
+            self._init_window()
+
+        if not hasattr(self, 'cache'):
+            self.cache = {}
+            self.cache_hits = 0
+            self.cache_misses = 0
+
+    def update_state(self, world, time, state, poses_file):
+        """
+        Clears the cached pose dependent values after updating the state,
+        moves the robot in the world's spatial index and marks it as
+        updated in the population state.
+        :param world:
+        :param time:
+        :param state:
+        :param poses_file:
+        :return:
+        """
+        prev_position, prev_update = self.last_position, self.last_update
+        super(Robot, self).update_state(world, time, state, poses_file)
+
+        if float(self.age()) >= self.warmup_time:
+            pos = self.last_position
+            ds = math.sqrt((pos.x - prev_position.x) ** 2 + (pos.y - prev_position.y) ** 2)
+            self._add_sample(pos, float(self.last_update), ds,
+                             float(self.last_update - prev_update))
+
+        self.cache.clear()
+        pos = self.last_position
+        world.spatial_index.update(self.name, pos.x, pos.y)
+        world.population_state.update(self)
+
+    def _add_sample(self, position, t, ds, dt):
+        """
+        Adds a sample to the speed window ring buffer, replacing
+        the oldest sample if the window is full.
+        :param position:
+        :param t:
+        :param ds: Planar distance covered since the previous sample
+        :param dt: Time passed since the previous sample
+        :return:
+        """
+        i = self._win_head
+        if self._win_count == self._win_size:
+            self._win_path -= self._win_ds[i]
+            self._win_time -= self._win_dt[i]
+        else:
+            self._win_count += 1
+
+        self._win_x[i], self._win_y[i], self._win_z[i] = position.x, position.y, position.z
+        self._win_t[i], self._win_ds[i], self._win_dt[i] = t, ds, dt
+        self._win_path += ds
+        self._win_time += dt
+        self._win_head = (i + 1) % self._win_size
+
+        if self._win_head == 0:
+            # Recompute the sums once per cycle through the buffer, so
+            # rounding errors cannot accumulate.
+            self._win_path = sum(self._win_ds[:self._win_count])
+            self._win_time = sum(self._win_dt[:self._win_count])
+
+    def _cached(self, key, func):
+        """
+        Returns the cached value for `key`, calling `func`
+        to compute it if it is not available.
+        :param key:
+        :param func:
+        :return:
+        """
+        try:
+            value = self.cache[key]
+            self.cache_hits += 1
+        except KeyError:
+            value = self.cache[key] = func()
+            self.cache_misses += 1
+
+        return value
+
+    def velocity(self):
+        """
+        :return: Cached velocity over the speed window
+        """
+        return self._cached('velocity', self._velocity)
+
+    def _velocity(self):
+        """
+        Velocity as the path length over the elapsed time in the speed window.
+        :return:
+        """
+        return self._win_path / self._win_time if self._win_time > 0 else 0.0
+
+    def displacement(self):
+        """
+        :return: Cached displacement over the speed window
+        """
+        return self._cached('displacement', self._displacement)
+
+    def _displacement(self):
+        """
+        Displacement between the oldest and newest sample in the speed window.
+        :return: Tuple of displacement vector and elapsed time in seconds
+        """
+        if not self._win_count:
+            return Vector3(0, 0, 0), 0.0
+
+        n = self._win_size
+        new = (self._win_head - 1) % n
+        old = self._win_head if self._win_count == n else 0
+        return Vector3(self._win_x[new] - self._win_x[old], self._win_y[new] - self._win_y[old],
+                       self._win_z[new] - self._win_z[old]), self._win_t[new] - self._win_t[old]
+
+    def displacement_velocity(self):
+        """
+        :return: Cached displacement velocity over the speed window
+        """
+        return self._cached('displacement_velocity', self._displacement_velocity)
+
+    def _displacement_velocity(self):
+        """
+        Planar displacement over the elapsed time in the speed window.
+        :return:
+        """
+        dist, dt = self.displacement()
+        if dt <= 0:
+            return 0.0
+
+        return math.sqrt(dist.x ** 2 + dist.y ** 2) / dt
+
     def will_mate_with(self, other):
         """
         Decides whether or not to mate with the other given robot
@@ -47,21 +255,15 @@ class Robot(RvRobot):
         :type other: Robot
         :return:
         """
-        if self.age() < self.conf.warmup_time:
-            # Don't mate within the warmup time
+        if not self.mating_ready():
             return False
 
-        mate_count = self.mated_with.get(other.name, 0)
+        mate_count = self.mated_with.get(other.robot.id, 0)
         if mate_count > self.conf.max_pair_children:
             # Maximum number of children with this other parent
             # has been reached
             return False
 
-        if self.last_mate is not None and \
-           float(self.last_update - self.last_mate) < self.conf.gestation_period:
-            # Don't mate within the cooldown window
-            return False
-
         if self.distance_to(other.last_position) > self.conf.mating_distance_threshold:
             return False
 
@@ -75,6 +277,23 @@ class Robot(RvRobot):
             (other_fitness / my_fitness) >= self.conf.mating_fitness_threshold
         )
 
+    def mating_ready(self):
+        """
+        Decides whether this robot is ready to mate at all,
+        regardless of the other robot.
+        :return:
+        """
+        if self.age() < self.conf.warmup_time:
+            # Don't mate within the warmup time
+            return False
+
+        if self.last_mate is not None and \
+           float(self.last_update - self.last_mate) < self.conf.gestation_period:
+            # Don't mate within the cooldown window
+            return False
+
+        return True
+
     def distance_to(self, vec, planar=True):
         """
         Calculates the Euclidean distance from this robot to
@@ -129,6 +348,13 @@ class Robot(RvRobot):
         in context of velocities instead.
         :return:
         """
+        return self._cached('fitness', self._fitness)
+
+    def _fitness(self):
+        """
+        Computes the uncached fitness, see `fitness`.
+        :return:
+        """
         age = self.age()
         if age < (0.25 * self.conf.evaluation_time) or age < self.conf.warmup_time:
             # We want at least some data
@@ -136,6 +362,47 @@ class Robot(RvRobot):
 
         return 5.0 * self.displacement_velocity() + self.velocity()
 
+    def fitness_bound(self, max_speed):
+        """
+        Optimistic upper bound on the fitness of this robot at the end of
+        its evaluation, i.e. with the first pose update at or after an age
+        of `warmup_time + evaluation_time`. It assumes that the robot moves
+        no faster than `max_speed` and that pose updates are
+        `1 / pose_update_frequency` apart.
+
+        Samples of the current window may drop out of the final window,
+        so the final displacement is bounded by the largest distance
+        between the newest sample and any sample in the current window,
+        plus the distance the robot can still cover. The final path
+        length is at most the current path length plus that distance,
+        and both are taken over no less than a full window.
+        :param max_speed: Maximum speed in m/s
+        :return:
+        """
+        dt = 1.0 / self.conf.pose_update_frequency
+
+        # Smallest span of the final window, with some room for rounding errors
+        span = (1.0 - 1e-6) * (self._win_size - 1) * dt
+        if span <= 0:
+            return float('inf')
+
+        end = self.conf.warmup_time + self.conf.evaluation_time + dt
+        reach = max_speed * max(0.0, end - float(self.age()))
+        return (5.0 * (self._spread() + reach) + self._win_path + reach) / span
+
+    def _spread(self):
+        """
+        :return: Largest planar distance between the newest sample in
+                 the speed window and any other sample in it.
+        """
+        if not self._win_count:
+            return 0.0
+
+        new = (self._win_head - 1) % self._win_size
+        x, y, xs, ys = self._win_x[new], self._win_y[new], self._win_x, self._win_y
+        return math.sqrt(max((xs[i] - x) ** 2 + (ys[i] - y) ** 2
+                             for i in xrange(self._win_count)))
+
     def charge(self):
         """
         Returns the remaining battery charge of this robot.
@@ -152,7 +419,5 @@ class Robot(RvRobot):
         """
         self.last_mate = self.last_update
 
-        if other.name in self.mated_with:
-            self.mated_with[other.name] += 1
-        else:
-            self.mated_with[other.name] = 1
+        other_id = other.robot.id
+        self.mated_with[other_id] = self.mated_with.get(other_id, 0) + 1
@@ -0,0 +1,182 @@
+from __future__ import absolute_import
+import heapq
+import itertools
+import time
+from collections import deque
+
+import trollius
+from trollius import From, Future
+
+
+class ScheduledTask(object):
+    """
+    A callback scheduled by the `Scheduler`.
+    """
+
+    def __init__(self, name, callback, due, interval=None):
+        """
+        :param name:
+        :param callback: Function without arguments, which may return
+                         a coroutine or future to wait for.
+        :param due: Simulation time at which the task is due
+        :param interval: Repeat interval in simulation seconds, `None`
+                         for a task that runs only once.
+        :return:
+        """
+        self.name = name
+        self.callback = callback
+        self.due = due
+        self.interval = interval
+        self.cancelled = False
+        self.pending = False
+        self.calls = 0
+        self.runtime = 0.0
+
+
+class Scheduler(object):
+    """
+    Runs callbacks at given simulation times. The scheduler is advanced
+    by calling `update` with the current simulation time, which queues
+    the tasks that are due; these are then run in order by `run_due`.
+    """
+
+    def __init__(self):
+        self.now = None
+        self.tasks = {}
+        self._queue = []
+        self._counter = itertools.count()
+        self._due = deque()
+        self._waiter = None
+
+    def every(self, name, interval, callback, start=None):
+        """
+        Schedules a callback every `interval` simulation seconds. With
+        an interval of zero the callback runs after every update.
+        :param name: Unique task name, replaces an existing task with the same name
+        :param interval:
+        :param callback:
+        :param start: Simulation time of the first call, defaults to one
+                      interval from now.
+        :return:
+        :rtype: ScheduledTask
+        """
+        if start is None:
+            start = (self.now or 0.0) + interval
+
+        return self._add(ScheduledTask(name, callback, start, interval))
+
+    def at(self, name, due, callback):
+        """
+        Schedules a callback once at the given simulation time.
+        :param name: Unique task name, replaces an existing task with the same name
+        :param due:
+        :param callback:
+        :return:
+        :rtype: ScheduledTask
+        """
+        return self._add(ScheduledTask(name, callback, due))
+
+    def _add(self, task):
+        self.cancel(task.name)
+        self.tasks[task.name] = task
+        heapq.heappush(self._queue, (task.due, next(self._counter), task))
+        return task
+
+    def cancel(self, name):
+        """
+        Cancels the task with the given name, if there is one.
+        :param name:
+        :return:
+        """
+        task = self.tasks.pop(name, None)
+        if task:
+            task.cancelled = True
+
+    def clear(self):
+        """
+        Cancels all tasks. The simulation time is kept, so tasks
+        scheduled afterwards are due relative to the current time.
+        :return:
+        """
+        for name in self.tasks.keys():
+            self.cancel(name)
+
+        del self._queue[:]
+        self._due.clear()
+
+    def update(self, now):
+        """
+        Advances the scheduler to simulation time `now`, queueing all
+        tasks that are due.
+        :param now:
+        :return:
+        """
+        self.now = now
+        repeat = []
+        while self._queue and self._queue[0][0] <= now:
+            _, _, task = heapq.heappop(self._queue)
+            if task.cancelled:
+                continue
+
+            if not task.pending:
+                task.pending = True
+                self._due.append(task)
+
+            if task.interval is not None:
+                # Skip any missed intervals rather than catching up
+                task.due += task.interval
+                if task.due <= now:
+                    task.due = now + task.interval
+
+                repeat.append(task)
+
+        for task in repeat:
+            heapq.heappush(self._queue, (task.due, next(self._counter), task))
+
+        if self._due and self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    @trollius.coroutine
+    def run_due(self, timeout=None):
+        """
+        Waits until at least one task is due, then runs all due tasks
+        one after the other, waiting for the ones that return a
+        coroutine or future.
+        :param timeout: Maximum number of wall clock seconds to wait for a
+                        due task, after which this returns without running
+                        anything. Tasks only become due with simulation
+                        updates, so this allows checking other conditions
+                        while the simulation is not running.
+        :return:
+        """
+        if not self._due:
+            self._waiter = Future()
+            try:
+                yield From(trollius.wait([self._waiter], timeout=timeout))
+            finally:
+                self._waiter = None
+
+        while self._due:
+            task = self._due.popleft()
+            task.pending = False
+            if task.cancelled:
+                continue
+
+            if task.interval is None:
+                # Tasks that run once can be cancelled until they run
+                del self.tasks[task.name]
+
+            before = time.time()
+            ret = task.callback()
+            if trollius.iscoroutine(ret) or isinstance(ret, Future):
+                yield From(ret)
+
+            task.calls += 1
+            task.runtime += time.time() - before
+
+    def stats(self):
+        """
+        :return: Dictionary with the number of calls and total wall clock
+                 runtime in seconds of every active task.
+        """
+        return {name: (task.calls, task.runtime) for name, task in self.tasks.iteritems()}
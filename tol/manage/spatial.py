@@ -0,0 +1,157 @@
+from __future__ import absolute_import
+import math
+
+
+class SpatialGrid(object):
+    """
+    Uniform grid over the x / y plane, used to find the items near
+    a position without looking at every item.
+    """
+
+    def __init__(self, cell_size):
+        """
+        :param cell_size: Width and height of a grid cell in meters.
+        :type cell_size: float
+        :return:
+        """
+        self.cell_size = float(cell_size)
+        self.positions = {}
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def keys(self):
+        """
+        :return:
+        """
+        return self.positions.keys()
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def update(self, key, x, y):
+        """
+        Inserts the given key or moves it to a new position.
+        :param key:
+        :param x:
+        :param y:
+        :return:
+        """
+        cell = self._cell(x, y)
+        old = self.positions.get(key)
+        self.positions[key] = (x, y, cell)
+
+        if old is not None:
+            if old[2] == cell:
+                return
+
+            self._remove_from_cell(key, old[2])
+
+        self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        """
+        Removes the given key if it is present.
+        :param key:
+        :return:
+        """
+        old = self.positions.pop(key, None)
+        if old is not None:
+            self._remove_from_cell(key, old[2])
+
+    def clear(self):
+        """
+        :return:
+        """
+        self.positions.clear()
+        self.cells.clear()
+
+    def _remove_from_cell(self, key, cell):
+        entries = self.cells[cell]
+        entries.discard(key)
+        if not entries:
+            del self.cells[cell]
+
+    def query_radius(self, x, y, radius):
+        """
+        Returns all items within the given radius of the given position.
+        :param x:
+        :param y:
+        :param radius:
+        :return: List of (key, distance) tuples
+        """
+        cx, cy = self._cell(x, y)
+        span = int(math.ceil(radius / self.cell_size))
+
+        # Large radii would visit many empty cells, in which case
+        # going over the occupied cells is cheaper.
+        if (2 * span + 1) ** 2 > len(self.cells):
+            cells = [c for c in self.cells if abs(c[0] - cx) <= span and abs(c[1] - cy) <= span]
+        else:
+            cells = [(i, j) for i in xrange(cx - span, cx + span + 1)
+                     for j in xrange(cy - span, cy + span + 1) if (i, j) in self.cells]
+
+        result = []
+        for cell in cells:
+            for key in self.cells[cell]:
+                px, py, _ = self.positions[key]
+                dist = math.sqrt((px - x) ** 2 + (py - y) ** 2)
+                if dist <= radius:
+                    result.append((key, dist))
+
+        return result
+
+    def nearest(self, x, y, exclude=None):
+        """
+        Returns the item nearest to the given position.
+        :param x:
+        :param y:
+        :param exclude: Key that should not be returned, e.g. the item
+                        at the query position itself.
+        :return: Tuple (key, distance), key is `None` if there are no items.
+        """
+        best, best_dist = None, float('inf')
+        if not self.cells:
+            return best, best_dist
+
+        cx, cy = self._cell(x, y)
+        max_ring = max(max(abs(c[0] - cx), abs(c[1] - cy)) for c in self.cells)
+
+        for ring in xrange(max_ring + 1):
+            for cell in self._ring(cx, cy, ring):
+                for key in self.cells.get(cell, ()):
+                    if key == exclude:
+                        continue
+
+                    px, py, _ = self.positions[key]
+                    dist = math.sqrt((px - x) ** 2 + (py - y) ** 2)
+                    if dist < best_dist:
+                        best, best_dist = key, dist
+
+            # Items outside the rings visited so far are at
+            # least `ring` cells away.
+            if best is not None and best_dist <= ring * self.cell_size:
+                break
+
+        return best, best_dist
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        """
+        Generates the cells at the given Chebyshev distance from a cell.
+        """
+        if ring == 0:
+            yield cx, cy
+            return
+
+        for i in xrange(cx - ring, cx + ring + 1):
+            yield i, cy - ring
+            yield i, cy + ring
+
+        for j in xrange(cy - ring + 1, cy + ring):
+            yield cx - ring, j
+            yield cx + ring, j
@@ -3,6 +3,7 @@ from __future__ import print_function, absolute_import
 import random
 import sys
 import math
+import heapq
 import trollius
 from trollius import From, Return, Future
 import time
@@ -21,11 +22,15 @@ from sdfbuilder import SDF, Model, Pose, Link
 
 # Local
 from ..config import constants, parser, str_to_address
-from ..build import get_builder, get_simulation_robot
+from ..build import get_builder, get_simulation_robot, count_intersections
 from ..spec import get_tree_generator, make_planar
 from revolve.util import multi_future, wait_for
 from .robot import Robot
-from ..scenery import Wall, BirthClinic
+from .cache import AnalyzerCache, body_key
+from .spatial import SpatialGrid
+from .population import PopulationState
+from .scheduler import Scheduler
+from ..scenery import Wall, Arena, BirthClinic
 from ..logging import logger
 
 # Construct a message base from the time. This should make
@@ -83,6 +88,41 @@ class World(WorldManager):
         self.model_control = None
         self.birth_clinic_model = None
 
+        # Statistics of the last pipelined population generation
+        self.population_stats = None
+
+        # Analyzer requests are sent one at a time, see `_analyze_tree`
+        self._analyzer_lock = trollius.Lock()
+
+        # Cache of analyzer results by robot body
+        self.analyzer_cache = None
+        if conf.analyzer_cache_size > 0:
+            self.analyzer_cache = AnalyzerCache(conf.analyzer_cache_size, conf.analyzer_cache_file)
+
+        # Number of bodies checked / rejected by the local prescreen
+        self.prescreen_checked = 0
+        self.prescreen_rejected = 0
+
+        # Spatial index of robot positions by robot name, written by the
+        # robots on every pose update; robots are removed in `delete_robot`.
+        self.spatial_index = SpatialGrid(conf.spatial_cell_size)
+
+        # Population totals, robots are marked as updated on every pose update
+        self.population_state = PopulationState()
+
+        # Simulation clock of the scheduler and `sleep_sim`, which
+        # is the world age as of the last update.
+        self.sim_time = 0.0
+
+        # Scheduler for tasks in simulation time
+        self.scheduler = Scheduler()
+
+        # Heap of (simulation time, sequence number, future) tuples
+        # for `sleep_sim`.
+        self._sleepers = []
+        self._sleeper_count = itertools.count()
+        self.add_update_trigger(self._advance_clock)
+
         # Write settings to config file
         if self.output_directory:
             parser.write_to_file(conf, os.path.join(self.output_directory, "settings.conf"))
@@ -108,6 +148,97 @@ class World(WorldManager):
             '/gazebo/default/model/modify', 'gazebo.msgs.Model'
         ))
 
+    @trollius.coroutine
+    def teardown(self):
+        """
+        Saves the analyzer cache if it is persisted.
+        :return:
+        """
+        yield From(super(World, self).teardown())
+        self.log_analyzer_stats()
+        if self.analyzer_cache:
+            self.analyzer_cache.save()
+
+    @trollius.coroutine
+    def create_snapshot(self):
+        """
+        Saves the analyzer cache along with the snapshot.
+        :return:
+        """
+        ret = yield From(super(World, self).create_snapshot())
+        self.log_analyzer_stats()
+        if ret and self.analyzer_cache:
+            self.analyzer_cache.save()
+
+        raise Return(ret)
+
+    def log_analyzer_stats(self):
+        """
+        Logs the hits and misses of the analyzer cache and the
+        number of bodies rejected by the local prescreen.
+        :return:
+        """
+        cache = self.analyzer_cache
+        if cache:
+            logger.debug("Analyzer cache: %d hits, %d misses, hit rate %.2f, %d entries." % (
+                cache.hits, cache.misses, cache.hit_rate(), len(cache.entries)))
+
+        if self.conf.local_prescreen:
+            logger.debug("Local prescreen: %d bodies checked, %d rejected." % (
+                self.prescreen_checked, self.prescreen_rejected))
+
+    def sleep_sim(self, seconds):
+        """
+        Returns a future that resolves with the first world update at
+        least `seconds` simulation seconds from now. No timers run while
+        waiting, the future is resolved by the update handler.
+        :param seconds:
+        :return:
+        :rtype: Future
+        """
+        future = Future()
+        heapq.heappush(self._sleepers, (self.sim_time + seconds, next(self._sleeper_count), future))
+        return future
+
+    def _advance_clock(self, _):
+        """
+        Update trigger that advances the simulation clock, which queues
+        the scheduled tasks that are due and resolves the `sleep_sim`
+        futures that are due.
+        :return:
+        """
+        self.sim_time = now = float(self.age())
+        self.scheduler.update(now)
+        while self._sleepers and self._sleepers[0][0] <= now:
+            _, _, future = heapq.heappop(self._sleepers)
+            if not future.done():
+                future.set_result(None)
+
+    def robots_within(self, position, radius):
+        """
+        Returns the robots within the given planar distance of a position.
+        :param position:
+        :type position: Vector3
+        :param radius:
+        :return: List of (robot, distance) tuples
+        """
+        return [(self.robots[name], dist) for name, dist
+                in self.spatial_index.query_radius(position.x, position.y, radius)
+                if name in self.robots]
+
+    @trollius.coroutine
+    def delete_robot(self, robot):
+        """
+        Removes the robot from the spatial index and population
+        state before deleting it.
+        :param robot:
+        :return:
+        """
+        self.spatial_index.remove(robot.name)
+        self.population_state.remove(robot.name)
+        ret = yield From(super(World, self).delete_robot(robot))
+        raise Return(ret)
+
     def robots_header(self):
         """
         Extends the robots header with a max age
@@ -127,8 +258,14 @@ class World(WorldManager):
         :param parents:
         :return:
         """
-        return Robot(self.conf, robot_name, tree, robot, position, time,
-                     battery_level=battery_level, parents=parents)
+        robot = Robot(self.conf, robot_name, tree, robot, position, time,
+                      battery_level=battery_level, parents=parents)
+
+        # Index new robots right away rather than with the next
+        # pose update, so that births can take them into account.
+        self.spatial_index.update(robot_name, position.x, position.y)
+        self.population_state.update(robot)
+        return robot
 
     @trollius.coroutine
     def add_highlight(self, position, color):
@@ -147,14 +284,25 @@ class World(WorldManager):
         raise Return(fut, hl)
 
     @trollius.coroutine
-    def generate_population(self, n):
+    def generate_population(self, n, window=None):
         """
         Generates population of `n` valid robots robots.
 
         :param n: Number of robots
+        :param window: Maximum number of analyzer requests kept in flight
+                       at the same time, defaults to the `analyzer_window`
+                       setting. With a window of 1 robots are generated
+                       one at a time.
         :return: Future with a list of valid robot trees and corresponding
                  bounding boxes.
         """
+        if window is None:
+            window = self.conf.analyzer_window
+
+        if window > 1:
+            ret = yield From(self._generate_population_pipelined(n, window))
+            raise Return(ret)
+
         logger.debug("Generating population...")
         trees = []
         bboxes = []
@@ -168,6 +316,74 @@ class World(WorldManager):
             trees.append(tree)
             bboxes.append(bbox)
 
+        self.log_analyzer_stats()
+        raise Return(trees, bboxes)
+
+    @trollius.coroutine
+    def _generate_population_pipelined(self, n, window, max_attempts=100):
+        """
+        Pipelined version of `generate_population`, which keeps up to
+        `window` candidate trees waiting for the analyzer and generates,
+        prescreens and looks up new candidates while earlier ones are
+        being checked. The analyzer itself still handles one request at
+        a time, see `analyze_tree`. Statistics of the run are stored in
+        `population_stats`, `scripts/analyzer_window.py` compares the
+        throughput with that of the sequential method.
+
+        :param n: Number of robots
+        :param window: Maximum number of analyzer requests in flight
+        :param max_attempts: Maximum number of candidates per robot, similar
+                             to `generate_valid_robot`.
+        :return: Future with a list of valid robot trees and corresponding
+                 bounding boxes.
+        """
+        logger.debug("Generating population (analyzer window %d)..." % window)
+        trees = []
+        bboxes = []
+        pending = set()
+        candidates = 0
+        rejected = 0
+        started = time.time()
+
+        @trollius.coroutine
+        def check(tree):
+            ret = yield From(self.analyze_tree(tree))
+            raise Return(tree, ret)
+
+        while len(trees) < n:
+            # Top up the window, but never have more candidates in
+            # flight than there are robots still required.
+            while len(pending) < window and (len(trees) + len(pending)) < n \
+                    and candidates < max_attempts * n:
+                candidates += 1
+                pending.add(trollius.Task(check(self.generator.generate_tree())))
+
+            if not pending:
+                logger.error("Maximum number of candidates reached while generating population.")
+                raise Return(None)
+
+            done, pending = yield From(trollius.wait(pending, return_when=trollius.FIRST_COMPLETED))
+            for task in done:
+                tree, ret = task.result()
+                if ret is None or ret[0]:
+                    rejected += 1
+                    continue
+
+                trees.append(tree)
+                bboxes.append(ret[1])
+
+        elapsed = max(time.time() - started, 1e-9)
+        self.population_stats = stats = {
+            'candidates': candidates,
+            'rejected': rejected,
+            'rejection_rate': float(rejected) / candidates if candidates else 0.0,
+            'candidates_per_second': candidates / elapsed,
+            'elapsed': elapsed
+        }
+        logger.debug("Generated population of %d from %d candidates in %.2fs: %.2f candidates/s, "
+                     "rejection rate %.2f." % (n, candidates, elapsed, stats['candidates_per_second'],
+                                               stats['rejection_rate']))
+        self.log_analyzer_stats()
         raise Return(trees, bboxes)
 
     @trollius.coroutine
@@ -197,13 +413,21 @@ class World(WorldManager):
         return get_simulation_robot(robot, robot_name, self.builder, self.conf)
 
     @trollius.coroutine
-    def build_walls(self, points):
+    def build_walls(self, points, single_model=False):
         """
         Builds a wall defined by the given points, used to shield the
         arena.
         :param points:
+        :param single_model: If true, the wall is inserted as a single
+                             model with one link per segment, rather than
+                             as a separate model for each segment.
         :return: Future that resolves when all walls have been inserted.
         """
+        if single_model:
+            arena = Arena("arena", points, constants.WALL_THICKNESS, constants.WALL_HEIGHT)
+            future = yield From(self.insert_model(SDF(elements=[arena])))
+            raise Return(future)
+
         futures = []
         l = len(points)
         for i in range(l):
@@ -264,6 +488,89 @@ class World(WorldManager):
         fut = yield From(self.model_control.publish(msg))
         raise Return(fut)
 
+    @trollius.coroutine
+    def analyze_tree(self, tree):
+        """
+        Overrides `analyze_tree` to look up the analyzer result in the
+        analyzer cache first. Collisions and bounding box only depend on
+        the robot body, so identical bodies with different brains are
+        only sent to the analyzer once.
+
+        If local prescreening is enabled, bodies with obviously
+        intersecting parts are rejected without consulting the analyzer,
+        in which case the returned bounding box is `None`.
+        :param tree:
+        :return: Future with analysis on the tree (collisions, bbox, robot)
+        """
+        cache = self.analyzer_cache
+        if not cache and not self.conf.local_prescreen:
+            ret = yield From(self._analyze_tree(tree))
+            raise Return(ret)
+
+        # The robot only gets an ID if it is not sent to the
+        # analyzer, which creates a robot with an ID of its own.
+        robot = tree.to_robot(0)
+        key = None
+        if cache:
+            key = body_key(robot.body)
+            cached = cache.get(key)
+            if cached is not None:
+                coll, bbox = cached
+                robot.id = self.get_robot_id()
+                raise Return(coll, bbox, robot)
+
+        if self.conf.local_prescreen:
+            coll = self.prescreen_robot(robot)
+            if coll:
+                if cache:
+                    cache.put(key, (coll, None))
+
+                robot.id = self.get_robot_id()
+                raise Return(coll, None, robot)
+
+        ret = yield From(self._analyze_tree(tree))
+        if ret is not None and cache:
+            cache.put(key, (ret[0], ret[1]))
+
+        raise Return(ret)
+
+    @trollius.coroutine
+    def _analyze_tree(self, tree):
+        """
+        Sends the tree to the analyzer. The analyzer handles a single
+        robot at a time, and like other requests an analyzer request
+        is sent until completion before the next one starts, so
+        concurrent callers wait for their turn here.
+        :param tree:
+        :return:
+        """
+        yield From(self._analyzer_lock.acquire())
+        try:
+            ret = yield From(super(World, self).analyze_tree(tree))
+        finally:
+            self._analyzer_lock.release()
+
+        raise Return(ret)
+
+    def prescreen_robot(self, robot):
+        """
+        Checks the body of the given robot for obviously intersecting
+        body parts locally.
+        :param robot: Protobuf robot
+        :return: The number of intersecting collision pairs found
+        """
+        model = self.builder.get_sdf_model(robot, analyzer_mode=True)
+        sdf = SDF()
+        sdf.add_element(model)
+        coll = count_intersections(sdf, margin=self.conf.prescreen_margin)
+
+        self.prescreen_checked += 1
+        if coll:
+            self.prescreen_rejected += 1
+            logger.debug("Local prescreen found %d intersecting part pairs." % coll)
+
+        return coll
+
     @trollius.coroutine
     def attempt_mate(self, ra, rb):
         """
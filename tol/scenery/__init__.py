@@ -1,3 +1,4 @@
 from .wall import Wall
+from .arena import Arena
 from .birth_clinic import BirthClinic
 __author__ = 'Elte Hupkes'
@@ -0,0 +1,44 @@
+from sdfbuilder import Model, Posable, Link
+from sdfbuilder.math import Vector3
+
+
+class Arena(Model):
+    """
+    Static model containing a closed arena wall, with one link per
+    wall segment. This allows inserting the complete wall in a single
+    request rather than inserting one `Wall` model per segment.
+    """
+
+    def __init__(self, name, points, thickness, height, **kwargs):
+        """
+        Construct an arena wall of the given thickness and height through
+        all the given points, where the last point is connected to
+        the first.
+
+        :param points: Corner points of the arena wall.
+        :type points: list[Vector3]
+        :return:
+        """
+        super(Arena, self).__init__(name, static=True, **kwargs)
+
+        self.walls = []
+        l = len(points)
+        for i in range(l):
+            start = points[i]
+            end = points[(i + 1) % l]
+            assert start.z == end.z, "Walls with different start / end z are undefined."
+
+            center = 0.5 * (end + start)
+            diff = end - start
+            wall = Link("wall_link_%d" % i)
+            wall.make_box(10e10, abs(diff), thickness, height)
+
+            # Rotate the wall so it aligns with the vector from
+            # start to end, see `Wall`.
+            wall.align(
+                Vector3(0, 0, 0), Vector3(1, 0, 0), Vector3(0, 0, 1),
+                center, diff, Vector3(0, 0, 1), Posable("mock")
+            )
+
+            self.walls.append(wall)
+            self.add_element(wall)